@@ -0,0 +1,82 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Monotonic timing of the target acquisitions.
+
+All durations are measured with time.perf_counter_ns(), which is monotonic and not affected by NTP adjustments of the
+system clock, and are stored as integer nanoseconds. The wall clock (time.time()) is only read for the start and end
+time of a condition.
+
+A handler only runs after the mouse event has waited in the Qt event queue, so the time the handler is called is
+later than the actual click. The EventClock maps the timestamp of the OS event (QMouseEvent.timestamp(), in ms) onto
+the perf_counter_ns() timeline: both clocks don't share an epoch, but an event can never be handled before it
+happened, so the smallest difference between both clocks seen so far is the offset between them (up to the ms
+resolution of the event timestamps).
+
+The event timestamps are 32-bit milliseconds that wrap around after about 49.7 days, and they can jump if the event
+source changes. If an event would be mapped more than MAX_EVENT_DELAY_NS before its handler was called, the offset is
+measured again from this event.
+"""
+
+import time
+from time import perf_counter_ns
+
+MAX_EVENT_DELAY_NS = 1_000_000_000  # an event that seems to have waited longer than this means the clock jumped
+
+
+class EventClock:
+
+    def __init__(self):
+        self.__offset_ns = None  # smallest (perf_counter_ns() - event timestamp) seen so far
+
+    def get_event_time_ns(self, event_timestamp_ms: int, handler_time_ns: int = None) -> int:
+        # returns the time of the event on the perf_counter_ns() timeline
+        if handler_time_ns is None:
+            handler_time_ns = perf_counter_ns()
+        if event_timestamp_ms == 0:
+            return handler_time_ns  # synthetic events (e.g. QCursor.setPos) don't have a timestamp
+        clock_difference_ns = handler_time_ns - event_timestamp_ms * 1_000_000
+        if self.__offset_ns is None or clock_difference_ns < self.__offset_ns or \
+                clock_difference_ns - self.__offset_ns > MAX_EVENT_DELAY_NS:
+            # a new smallest difference, or the event timestamps jumped back (e.g. wrapped around), then the old offset
+            # would map every later event before the ones that were already handled
+            self.__offset_ns = clock_difference_ns
+        return event_timestamp_ms * 1_000_000 + self.__offset_ns
+
+    def get_event_delay_ns(self, event_timestamp_ms: int, handler_time_ns: int) -> int:
+        # how long the event waited until the handler was called
+        return handler_time_ns - self.get_event_time_ns(event_timestamp_ms, handler_time_ns)
+
+
+class AcquisitionTimer:
+    """
+    Measures the time of every target acquisition of a condition (from the previous click, or the start of the
+    condition, until the click on the target).
+    """
+
+    def __init__(self, event_clock: EventClock = None):
+        self.__event_clock = event_clock if event_clock is not None else EventClock()
+        self.__start_time_as_unix = None
+        self.__start_ns = None
+        self.__last_mark_ns = None
+
+    @property
+    def startTimeAsUnix(self):
+        return self.__start_time_as_unix
+
+    def start(self) -> None:
+        self.__start_time_as_unix = time.time()
+        self.__start_ns = perf_counter_ns()
+        self.__last_mark_ns = self.__start_ns
+
+    def mark(self, event_timestamp_ms: int = 0) -> int:
+        # returns the duration since the last mark (or the start) in nanoseconds
+        mark_ns = max(self.__event_clock.get_event_time_ns(event_timestamp_ms), self.__last_mark_ns)
+        duration_ns = mark_ns - self.__last_mark_ns
+        self.__last_mark_ns = mark_ns
+        return duration_ns
+
+    def get_elapsed_ns(self) -> int:
+        # the time from the start until the last mark
+        return self.__last_mark_ns - self.__start_ns
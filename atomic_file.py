@@ -0,0 +1,31 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Replaces files that are derived from other files (the compiled ui module, the sidecar index of the log and the cache of
+the analysis) without ever leaving a half-written file behind.
+
+The new content is written to a temporary file next to the target, which is renamed to the target file name only after
+it was written completely. The rename is atomic, so the target file either has the old or the new content, even if
+the process crashes while writing.
+"""
+
+import os
+from contextlib import contextmanager
+
+
+@contextmanager
+def atomic_write(file_name: str, mode: str = "w", **open_kwargs):
+    # yields the opened temporary file; mode and open_kwargs are passed to open(), e.g. mode="wb" for binary files
+    temporary_file_name = file_name + ".tmp"
+    try:
+        with open(temporary_file_name, mode, **open_kwargs) as temporary_file:
+            yield temporary_file
+        os.replace(temporary_file_name, file_name)
+    except BaseException:
+        # the target file keeps its old content
+        try:
+            os.remove(temporary_file_name)
+        except OSError:
+            pass
+        raise
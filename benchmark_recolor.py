@@ -0,0 +1,100 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-benchmark for the recoloring of the target labels on mouse moves.
+
+Feeds synthetic mouse move events (a noisy movement from target to target of the given layout) through the same
+hover logic as PointingExperiment.mouseMoveEvent and reports how often the labels were recolored (and how long it
+took) with the old behaviour (a new QGraphicsColorizeEffect on every call) and with the LabelColorizer.
+
+Usage: python3 benchmark_recolor.py [setup_file] [number_of_move_events]
+"""
+
+import json
+import os
+import random
+import sys
+import time
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QGraphicsColorizeEffect, QLabel, QWidget
+from label_colorizer import LabelColorizer
+from target_layout import TargetLayout
+
+
+class NaiveColorizer:
+    # the old behaviour: allocate and assign a new effect on every call
+
+    def __init__(self):
+        self.recolorCount = 0
+
+    def set_color(self, label, color):
+        color_effect = QGraphicsColorizeEffect()
+        color_effect.setColor(color)
+        label.setGraphicsEffect(color_effect)
+        self.recolorCount += 1
+
+
+def create_synthetic_moves(circle_positions, event_count, seed=0):
+    # the cursor moves towards the next target in small noisy steps and "clicks" it once it is reached
+    rng = random.Random(seed)
+    moves = []
+    pos_x, pos_y = 0, 0
+    target_id = 0
+    while len(moves) < event_count:
+        target_x, target_y = circle_positions[target_id % len(circle_positions)]
+        distance = max(abs(target_x - pos_x), abs(target_y - pos_y))
+        if distance <= 2:
+            target_id += 1
+            continue
+        step = min(distance, rng.randint(2, 12)) / distance
+        pos_x += round((target_x - pos_x) * step) + rng.randint(-1, 1)
+        pos_y += round((target_y - pos_y) * step) + rng.randint(-1, 1)
+        moves.append((pos_x, pos_y, target_id % len(circle_positions)))
+    return moves
+
+
+def run_benchmark(colorizer, circle_positions, circle_radius, moves):
+    page = QWidget()
+    labels = []
+    for circle_x, circle_y in circle_positions:
+        label = QLabel(page)
+        label.setFixedSize(circle_radius * 2, circle_radius * 2)
+        label.move(circle_x - circle_radius, circle_y - circle_radius)
+        colorizer.set_color(label, Qt.yellow)
+        labels.append(label)
+    initial_count = colorizer.recolorCount
+
+    last_target_id = 0
+    start = time.perf_counter()
+    for pos_x, pos_y, target_id in moves:
+        if target_id != last_target_id:
+            # the previous target was clicked
+            colorizer.set_color(labels[last_target_id], Qt.yellow)
+            last_target_id = target_id
+        circle_x, circle_y = circle_positions[target_id]
+        if (pos_x - circle_x) ** 2 + (pos_y - circle_y) ** 2 <= circle_radius ** 2:
+            colorizer.set_color(labels[target_id], Qt.darkRed)
+        else:
+            colorizer.set_color(labels[target_id], Qt.blue)
+    duration = time.perf_counter() - start
+    return colorizer.recolorCount - initial_count, duration
+
+
+if __name__ == '__main__':
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QtWidgets.QApplication(sys.argv)
+    setup_file = sys.argv[1] if len(sys.argv) > 1 else "setup_json.json"
+    event_count = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+
+    with open(setup_file) as json_file:
+        setup_dict = json.load(json_file)
+    positions = TargetLayout.from_setup(setup_dict, os.path.dirname(setup_file)).get_positions()
+    radius = setup_dict["circleRadiusList"][0]
+    synthetic_moves = create_synthetic_moves(positions, event_count)
+
+    for name, benchmark_colorizer in (("before (new effect per call)", NaiveColorizer()),
+                                      ("after (LabelColorizer)", LabelColorizer())):
+        recolor_count, seconds = run_benchmark(benchmark_colorizer, positions, radius, synthetic_moves)
+        print(f"{name}: {recolor_count} recolors per {event_count} move events, {seconds * 1000:.1f} ms")
@@ -0,0 +1,118 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Append-only writer for the experiment log.
+
+Instead of rewriting the whole CSV file for every new row, only the new row is appended to the end of the file. The
+disk I/O (including fsync) is done by a background thread, so the GUI thread never has to wait for the disk.
+"""
+
+import atexit
+import csv
+import io
+import os
+import queue
+import threading
+
+# when the file is synced to disk: after every row, whenever all queued rows have been written, or never (the
+# operating system decides)
+FSYNC_ALWAYS = "always"
+FSYNC_BATCH = "batch"
+FSYNC_NEVER = "never"
+
+
+def format_csv_row(values: list) -> str:
+    # uses the same quoting as pandas' to_csv, so the appended rows look exactly like the ones already in the file
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()
+
+
+class AppendOnlyCsvWriter:
+
+    def __init__(self, file_name: str, columns: list, fsync_policy: str = FSYNC_ALWAYS, background: bool = True,
+                 on_rows_written=None):
+        if fsync_policy not in (FSYNC_ALWAYS, FSYNC_BATCH, FSYNC_NEVER):
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+        self.__file_name = file_name
+        self.__columns = columns
+        self.__fsync_policy = fsync_policy
+        # called (on the writer thread) with the rows that were written and the new size of the file
+        self.__on_rows_written = on_rows_written
+
+        self.__file = None
+        self.__queue = None
+        self.__thread = None
+        if background:
+            self.__queue = queue.Queue()
+            self.__thread = threading.Thread(target=self.__run, name="csv-log-writer", daemon=True)
+            self.__thread.start()
+        atexit.register(self.close)
+
+    def append(self, values: list) -> str:
+        # returns the formatted row (e.g. to print it), the row is written to the file in the background
+        line = format_csv_row(values)
+        if self.__queue is not None:
+            self.__queue.put((values, line))
+        else:
+            self.__write_rows([(values, line)])
+        return line
+
+    def flush(self) -> None:
+        # blocks until every row that was appended so far has been written
+        if self.__queue is not None:
+            self.__queue.join()
+
+    def close(self) -> None:
+        if self.__thread is not None and self.__thread.is_alive():
+            self.__queue.put(None)
+            self.__thread.join()
+        if self.__file is not None:
+            self.__file.close()
+            self.__file = None
+
+    def __run(self):
+        while True:
+            rows = [self.__queue.get()]
+            # write everything that is already waiting in one go
+            while not self.__queue.empty():
+                rows.append(self.__queue.get())
+            stop = None in rows
+            try:
+                self.__write_rows([row for row in rows if row is not None])
+            finally:
+                for _ in rows:
+                    self.__queue.task_done()
+            if stop:
+                return
+
+    def __open(self):
+        self.__file = open(self.__file_name, "a+b")
+        file_size = self.__file.seek(0, os.SEEK_END)
+        if file_size == 0:
+            self.__file.write(format_csv_row(self.__columns).encode())
+        else:
+            self.__file.seek(file_size - 1)
+            if self.__file.read(1) != b"\n":
+                self.__file.write(b"\n")  # the last row was not terminated
+
+    def __write_rows(self, rows: list) -> None:
+        if not rows:
+            return
+        if self.__file is None:
+            self.__open()
+        for _, line in rows:
+            self.__file.write(line.encode())
+            if self.__fsync_policy == FSYNC_ALWAYS:
+                self.__sync()
+        if self.__fsync_policy == FSYNC_BATCH:
+            self.__sync()
+        else:
+            self.__file.flush()
+        if self.__on_rows_written is not None:
+            self.__on_rows_written([values for values, _ in rows], self.__file.tell())
+
+    def __sync(self):
+        self.__file.flush()
+        os.fsync(self.__file.fileno())
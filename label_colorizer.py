@@ -0,0 +1,47 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+from PyQt5.QtGui import QColor
+from PyQt5.QtWidgets import QGraphicsColorizeEffect
+
+
+class LabelColorizer:
+    """
+    Colors the target labels with a QGraphicsColorizeEffect. Every label gets exactly one effect that is reused for
+    all later color changes, and the label is only touched if its color (i.e. its idle/active/hover state) actually
+    changes, so repeated calls with the same color on every mouse move don't cause any allocations or repaints.
+    """
+
+    def __init__(self):
+        self.__effects = {}
+        self.__colors = {}
+        self.__recolor_count = 0
+
+    @property
+    def recolorCount(self):
+        # how often a label was actually recolored
+        return self.__recolor_count
+
+    def set_color(self, label, color) -> bool:
+        rgba = QColor(color).rgba()
+        if self.__colors.get(label) == rgba:
+            return False
+
+        effect = self.__effects.get(label)
+        if effect is None:
+            effect = QGraphicsColorizeEffect()
+            label.setGraphicsEffect(effect)  # the label takes ownership of the effect
+            self.__effects[label] = effect
+        effect.setColor(QColor(color))
+        self.__colors[label] = rgba
+        self.__recolor_count += 1
+        return True
+
+    def release(self, label=None) -> None:
+        # forget the cached state of one label (or all labels), e.g. before the labels are deleted
+        if label is None:
+            self.__effects.clear()
+            self.__colors.clear()
+        else:
+            self.__effects.pop(label, None)
+            self.__colors.pop(label, None)
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Opt-in latency instrumentation for the event handlers of the pointing experiment.
+
+Every handler duration is measured with time.perf_counter_ns() and counted in a fixed-size histogram with logarithmic
+buckets (four buckets per power of two), so recording a value never allocates anything and the percentiles can be
+read at any time. Besides the handler durations the monitor records how long an input event waited in the Qt event
+queue: the difference between the time of the OS event (QMouseEvent.timestamp()) and the time the handler was called
+(see EventClock in acquisition_timer.py).
+
+Every target acquisition during which a handler took longer (or an event waited longer) than one frame is marked as
+lagging, so these trials can be excluded from the analysis.
+"""
+
+from time import perf_counter_ns
+from acquisition_timer import EventClock
+
+LAG_THRESHOLD_NS = 16_666_667  # one frame at 60 Hz
+EVENT_DELAY = "eventDelay"
+HANDLER_NAMES = ["mouseMoveEvent", "mousePressEvent", "BubbleCursor.onMouseMoved", "paintEvent"]
+
+_SUB_BUCKET_BITS = 2
+_BUCKET_COUNT = 64 << _SUB_BUCKET_BITS
+
+
+class LatencyHistogram:
+
+    def __init__(self):
+        self.__counts = [0] * _BUCKET_COUNT
+        self.__count = 0
+        self.__max_ns = 0
+
+    @property
+    def count(self):
+        return self.__count
+
+    @property
+    def maxNs(self):
+        return self.__max_ns
+
+    @staticmethod
+    def _get_bucket(duration_ns: int) -> int:
+        # values below 2 ** _SUB_BUCKET_BITS get their own bucket, above that every power of two is split into
+        # 2 ** _SUB_BUCKET_BITS buckets (i.e. the relative error is at most 25%)
+        bit_length = duration_ns.bit_length()
+        if bit_length <= _SUB_BUCKET_BITS:
+            return duration_ns
+        return ((bit_length - _SUB_BUCKET_BITS) << _SUB_BUCKET_BITS) + \
+            ((duration_ns >> (bit_length - _SUB_BUCKET_BITS - 1)) & ((1 << _SUB_BUCKET_BITS) - 1))
+
+    @staticmethod
+    def _get_bucket_upper_bound(bucket: int) -> int:
+        if bucket < 1 << _SUB_BUCKET_BITS:
+            return bucket
+        shift = (bucket >> _SUB_BUCKET_BITS) - 1
+        return ((bucket & ((1 << _SUB_BUCKET_BITS) - 1) | (1 << _SUB_BUCKET_BITS)) + 1 << shift) - 1
+
+    def record(self, duration_ns: int) -> None:
+        duration_ns = max(int(duration_ns), 0)
+        self.__counts[min(self._get_bucket(duration_ns), _BUCKET_COUNT - 1)] += 1
+        self.__count += 1
+        if duration_ns > self.__max_ns:
+            self.__max_ns = duration_ns
+
+    def get_percentile_ns(self, percentile: float) -> int:
+        # upper bound of the bucket that contains the percentile (never more than the maximum)
+        if self.__count == 0:
+            return 0
+        rank = percentile / 100 * self.__count
+        cumulative_count = 0
+        for bucket, bucket_count in enumerate(self.__counts):
+            cumulative_count += bucket_count
+            if bucket_count > 0 and cumulative_count >= rank:
+                return min(self._get_bucket_upper_bound(bucket), self.__max_ns)
+        return self.__max_ns
+
+    def clear(self) -> None:
+        for bucket in range(_BUCKET_COUNT):
+            self.__counts[bucket] = 0
+        self.__count = 0
+        self.__max_ns = 0
+
+
+class LatencyMonitor:
+
+    SUMMARY_COLUMNS = [f"{name}{statistic}" for name in HANDLER_NAMES + [EVENT_DELAY]
+                       for statistic in ("Count", "P50Ms", "P99Ms", "MaxMs")]
+
+    def __init__(self, lag_threshold_ns: int = LAG_THRESHOLD_NS, event_clock: EventClock = None):
+        self.__lag_threshold_ns = lag_threshold_ns
+        self.__histograms = {name: LatencyHistogram() for name in HANDLER_NAMES + [EVENT_DELAY]}
+        self.__event_clock = event_clock if event_clock is not None else EventClock()
+        self.__lagging = False  # if anything took longer than the threshold since the last call of take_lag_marker
+
+    def record(self, name: str, start_ns: int) -> None:
+        # records the time from start_ns (perf_counter_ns() at the start of the handler) until now
+        duration_ns = perf_counter_ns() - start_ns
+        self.__histograms[name].record(duration_ns)
+        if duration_ns > self.__lag_threshold_ns:
+            self.__lagging = True
+
+    def record_event_delay(self, event_timestamp_ms: int, handler_start_ns: int) -> None:
+        if event_timestamp_ms == 0:
+            return  # synthetic events (e.g. QCursor.setPos) don't have a timestamp
+        delay_ns = self.__event_clock.get_event_delay_ns(event_timestamp_ms, handler_start_ns)
+        self.__histograms[EVENT_DELAY].record(delay_ns)
+        if delay_ns > self.__lag_threshold_ns:
+            self.__lagging = True
+
+    def take_lag_marker(self) -> bool:
+        # returns if the UI was lagging since the last call (i.e. during the current target acquisition)
+        lagging = self.__lagging
+        self.__lagging = False
+        return lagging
+
+    def get_summary(self) -> list:
+        # the values for SUMMARY_COLUMNS
+        summary = []
+        for histogram in self.__histograms.values():
+            summary += [histogram.count, histogram.get_percentile_ns(50) / 1e6, histogram.get_percentile_ns(99) / 1e6,
+                        histogram.maxNs / 1e6]
+        return summary
+
+    def get_overlay_text(self) -> str:
+        lines = []
+        for name, histogram in self.__histograms.items():
+            lines.append(f"{name}: p50 {histogram.get_percentile_ns(50) / 1e6:.2f} ms, "
+                         f"p99 {histogram.get_percentile_ns(99) / 1e6:.2f} ms, max {histogram.maxNs / 1e6:.2f} ms")
+        return "\n".join(lines)
+
+    def clear(self) -> None:
+        for histogram in self.__histograms.values():
+            histogram.clear()
+        self.__lagging = False
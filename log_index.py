@@ -0,0 +1,104 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Small sidecar file next to the experiment log that stores the number of logged rows and the highest participant id.
+
+On startup only the sidecar has to be read instead of parsing the whole log. If the log was changed by someone else
+in the meantime, only the part that was appended since the sidecar was written is scanned (or the whole log if it was
+shortened or rewritten).
+"""
+
+import csv
+import json
+import os
+from atomic_file import atomic_write
+
+PARTICIPANT_ID_COLUMN = "participantID"
+
+
+class LogIndex:
+
+    def __init__(self, log_file_name: str, index_file_name: str = None):
+        self.__log_file_name = log_file_name
+        self.__index_file_name = index_file_name or log_file_name + ".index.json"
+        self.__row_count = 0
+        self.__max_participant_id = 0  # 0 if no participant has been logged yet
+        self.__log_size = 0
+        self.__load()
+
+    @property
+    def rowCount(self):
+        return self.__row_count
+
+    @property
+    def maxParticipantID(self):
+        return self.__max_participant_id
+
+    def __load(self):
+        if not os.path.isfile(self.__log_file_name):
+            return
+
+        log_stat = os.stat(self.__log_file_name)
+        index_data = self.__read_index_file()
+        if index_data is not None and index_data["logSize"] == log_stat.st_size and \
+                index_data["logMtimeNs"] == log_stat.st_mtime_ns:
+            # the index is up to date
+            self.__row_count = index_data["rowCount"]
+            self.__max_participant_id = index_data["maxParticipantID"]
+            self.__log_size = index_data["logSize"]
+            return
+
+        if index_data is not None and index_data["logSize"] < log_stat.st_size:
+            # rows were appended since the index was written; only these rows have to be scanned
+            self.__row_count = index_data["rowCount"]
+            self.__max_participant_id = index_data["maxParticipantID"]
+            self.__log_size = index_data["logSize"]
+        # otherwise the index is missing or the log was rewritten, so everything has to be counted again
+        self.__scan_log_from(self.__log_size)
+        self.save()
+
+    def __read_index_file(self):
+        try:
+            with open(self.__index_file_name) as index_file:
+                index_data = json.load(index_file)
+            if {"rowCount", "maxParticipantID", "logSize", "logMtimeNs"} <= index_data.keys():
+                return index_data
+        except (OSError, ValueError):
+            pass
+        return None  # the index is missing or broken and has to be rebuilt
+
+    def __scan_log_from(self, offset: int) -> None:
+        with open(self.__log_file_name, "rb") as log_file:
+            header = next(csv.reader([log_file.readline().decode()]), None)
+            if header is None or PARTICIPANT_ID_COLUMN not in header:
+                self.__log_size = log_file.seek(0, os.SEEK_END)
+                return
+            participant_column = header.index(PARTICIPANT_ID_COLUMN)
+            if offset > log_file.tell():
+                log_file.seek(offset)
+
+            for row in csv.reader(line.decode() for line in log_file):
+                if len(row) > participant_column:
+                    self.__add_row(row[participant_column])
+            self.__log_size = log_file.tell()
+
+    def __add_row(self, participant_id) -> None:
+        self.__row_count += 1
+        try:
+            self.__max_participant_id = max(self.__max_participant_id, int(float(participant_id)))
+        except ValueError:
+            pass  # rows without a valid participant id are counted but don't change the next id
+
+    def add_rows(self, participant_ids: list, log_size: int) -> None:
+        # called after the rows have been appended to the log file, which now has the given size
+        for participant_id in participant_ids:
+            self.__add_row(participant_id)
+        self.__log_size = log_size
+        self.save()
+
+    def save(self) -> None:
+        index_data = {"rowCount": self.__row_count, "maxParticipantID": self.__max_participant_id,
+                      "logSize": self.__log_size, "logMtimeNs": os.stat(self.__log_file_name).st_mtime_ns}
+        with atomic_write(self.__index_file_name) as index_file:
+            json.dump(index_data, index_file)
@@ -2,16 +2,28 @@
 # -*- coding: utf-8 -*-
 
 import sys
+import argparse
 from PyQt5.QtWidgets import *
-from PyQt5 import QtCore, QtGui, QtWidgets, uic
+from PyQt5 import QtCore, QtGui, QtWidgets
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
 import time
-import pandas as pd
 import os
 import json
-from pointing_technique import BubbleCursor, Target
-import math
+from time import perf_counter_ns
+from acquisition_timer import AcquisitionTimer, EventClock
+from pointing_technique import BubbleCursor
+from label_colorizer import LabelColorizer
+from latency_monitor import LatencyMonitor
+from csv_log_writer import AppendOnlyCsvWriter, FSYNC_ALWAYS
+from log_index import LogIndex
+from setup_condition import get_balanced_condition_list, get_setup_file_for_participant
+from spatial_index import get_spatial_index_class
+from target_canvas import TARGET_STYLE_SHEET, TargetCanvas
+from target_layout import TargetLayout
+from trial_table import TrialTableWriter
+from trajectory_recorder import TrajectoryRecorder
+from ui_loader import load_ui
 
 '''We split the work on this assignment as follows:
     We planned our study together.
@@ -22,26 +34,61 @@ import math
 
 class PointingExperiment(QtWidgets.QWidget):
 
-    def __init__(self, setup_file, use_pointing_technique):
+    RENDER_MODE_LABELS = "labels"  # one styled QLabel per target
+    RENDER_MODE_CANVAS = "canvas"  # all targets are painted by one TargetCanvas (for layouts with many targets)
+
+    def __init__(self, setup_file, use_pointing_technique, coalesce_repaints=False, trial_table_file=None,
+                 trajectory_directory=None, render_mode=RENDER_MODE_LABELS, latency_log_file=None, kiosk_mode=False):
         super().__init__()
-        self.__experiment_logger = PointingExperimentLogger()
+        # in the kiosk mode the participants run one after another in the same process (see __start_next_session)
+        self.__kiosk_mode = kiosk_mode
+        self.__experiment_logger = PointingExperimentLogger(trial_table_file=trial_table_file,
+                                                            latency_log_file=latency_log_file)
         self.__participant_id = self.__experiment_logger.get_next_participant_id()
         self.__experiment_started = False
         self.__custom_pointing_technique_active = use_pointing_technique
-        self.__start_time = None
-
-        self.__target_label_list = []
+        # the acquisition times are measured from the timestamps of the mouse events on a monotonic clock
+        self.__event_clock = EventClock()
+        self.__acquisition_timer = AcquisitionTimer(self.__event_clock)
+
+        self.__render_mode = render_mode
+        # all conditions share one page with the targets, its widgets are reused and only repositioned and resized
+        self.__target_page = None
+        self.__target_label_list = []  # pool of target labels, can contain more labels than the current layout
+        self.__target_label_radius = None  # the radius the labels in the pool are currently styled for
+        self.__label_colorizer = LabelColorizer()
+        self.__target_canvas = None
         self.__all_targets = []
+        self.__pointing_technique = None
+        # the setup file can also be a layout bundle (see setup_condition.py), then every participant gets their own
+        # layout
         self.__setup_file = setup_file
-        self.__setup_dict = self.__setup_file_to_dict(self.__setup_file)
-        self.__circle_count = self.__setup_dict["numberOfCircles"]
-        self.__condition_list = self.__setup_dict["circleRadiusList"]
+        self.__loaded_setup_file = None
+        self.__load_setup()
         self.__counter_balanced_condition_list = []  # will be set on experiment start
         self.__condition_count = len(self.__counter_balanced_condition_list)
         self.__current_condition_id = 0
 
-        self.ui = uic.loadUi("pointing.ui", self)
+        # collect the areas that have to be repainted and repaint them at most once per display frame
+        self.__coalesce_repaints = coalesce_repaints
+        self.__pending_repaint_region = QRegion()
+        self.__repaint_timer = QTimer(self)
+        self.__repaint_timer.setSingleShot(True)
+        self.__repaint_timer.timeout.connect(self.__repaint_pending_region)
+
+        # optionally record every mouse move event of a condition (written to trajectory_directory)
+        self.__trajectory_recorder = TrajectoryRecorder(trajectory_directory) if trajectory_directory else None
+
+        # optionally measure how long the event handlers take (and how long the events waited in the event queue);
+        # a summary is written to latency_log_file for every condition
+        self.__latency_monitor = LatencyMonitor(event_clock=self.__event_clock) if latency_log_file else None
+        self.__lagging_target_list = []
+
+        # the ui is compiled into a python module once, so the .ui file doesn't have to be parsed on every start
+        self.ui = load_ui(self, "pointing.ui")
         self.__init_ui()
+        if self.__latency_monitor is not None:
+            self.__init_latency_overlay()
         self.show()
         self.setMouseTracking(True)
 
@@ -49,50 +96,76 @@ class PointingExperiment(QtWidgets.QWidget):
         self.ui.stackedWidget.setCurrentIndex(0)
         self.ui.startExperimentButton.clicked.connect(self.__start_experiment)
         self.ui.closeButton.clicked.connect(lambda: sys.exit(0))
+        self.ui.nextParticipantButton.clicked.connect(self.__start_next_session)
+        # in the kiosk mode the participants can't quit the application, only the next participant can start
+        self.ui.closeButton.setVisible(not self.__kiosk_mode)
+        self.ui.nextParticipantButton.setVisible(self.__kiosk_mode)
         self.ui.participantIdTextBox.setPlainText(str(self.__participant_id))
 
-    def __get_balanced_condition_list(self, condition_list, participant_id):
-        condition_count = len(condition_list)
-
-        # First we need to create a balanced latin square according to our number of conditions:
-        # https://medium.com/@graycoding/balanced-latin-squares-in-python-2c3aa6ec95b9
-        balanced_order = [[((j // 2 + 1 if j % 2 else condition_count - j // 2) + i) % condition_count + 1 for j in
-                           range(condition_count)] for i in range(condition_count)]
-        if condition_count % 2:  # Repeat reversed for odd n
-            balanced_order += [seq[::-1] for seq in balanced_order]
-        order_for_participant = balanced_order[participant_id % condition_count]
-
-        # Now we will reorder our conditions-list with the balanced-latin-square order we created above
-        # https://stackoverflow.com/questions/2177590/how-can-i-reorder-a-list/2177607
-        for i in range(len(order_for_participant)):
-            order_for_participant[i] -= 1
+    def __init_latency_overlay(self):
+        # created after the ui, so the overlay is on top of all pages
+        self.__latency_overlay = QLabel(self)
+        self.__latency_overlay.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.__latency_overlay.setStyleSheet("background-color: rgba(0, 0, 0, 120); color: white; padding: 4px;")
+        self.__latency_overlay.move(0, 0)
+        self.__latency_overlay_timer = QTimer(self)
+        self.__latency_overlay_timer.timeout.connect(self.__update_latency_overlay)
+        self.__latency_overlay_timer.start(500)
+
+    def __update_latency_overlay(self):
+        self.__latency_overlay.setText(self.__latency_monitor.get_overlay_text())
+        self.__latency_overlay.adjustSize()
+        self.__latency_overlay.raise_()
+
+    def __start_next_session(self):
+        # all widgets of the last session were already released by __release_targets, so only the state of the
+        # participant has to be reset; the logger knows the next participant id without reading the log again
+        self.__current_condition_id = 0
+        self.__counter_balanced_condition_list = []
+        self.__participant_id = self.__experiment_logger.get_next_participant_id()
+        self.ui.participantIdTextBox.setPlainText(str(self.__participant_id))
+        self.ui.stackedWidget.setCurrentIndex(0)
 
-        return [condition_list[i] for i in order_for_participant]
+    def __load_setup(self):
+        setup_file = get_setup_file_for_participant(self.__setup_file, self.__participant_id)
+        setup_file_mtime = os.stat(setup_file).st_mtime_ns
+        if (setup_file, setup_file_mtime) == self.__loaded_setup_file:
+            return  # the layout is already loaded and can be shared with this participant
 
-    def __setup_file_to_dict(self, setup_file):
         with open(setup_file) as json_file:
-            return json.load(json_file)
+            self.__setup_dict = json.load(json_file)
+        self.__circle_count = self.__setup_dict["numberOfCircles"]
+        self.__condition_list = self.__setup_dict["circleRadiusList"]
+        # the coordinates are only parsed once, all conditions use the same layout object
+        self.__target_layout = TargetLayout.from_setup(self.__setup_dict, os.path.dirname(setup_file))
+        self.__loaded_setup_file = (setup_file, setup_file_mtime)
 
     def __start_experiment(self):
 
         self.__currentTargetId = 0
-        self.__target_label_list = []
-        self.__all_targets = []
         self.__pointer_position_list = []
         self.__time_per_target_list = []
+        self.__lagging_target_list = []
         self.__miss_click_count = 0
+        self.__condition_end_time = None
 
         self.__participant_id = int(self.ui.participantIdTextBox.toPlainText())
-        self.__counter_balanced_condition_list = self.__get_balanced_condition_list(self.__condition_list,
-                                                                                    self.__participant_id)
+        if self.__current_condition_id == 0:
+            # the participant id may have been changed on the start page
+            self.__load_setup()
+        self.__counter_balanced_condition_list = get_balanced_condition_list(self.__condition_list,
+                                                                             self.__participant_id)
         self.__setup_targets()
-        self.__start_time = time.time()
-        self.__last_target_time = self.__start_time
+        if self.__trajectory_recorder is not None:
+            self.__trajectory_recorder.clear()
+        if self.__latency_monitor is not None:
+            self.__latency_monitor.clear()
+        self.__acquisition_timer.start()
         self.__move_mouse_to_top_left_corner()
         self.__experiment_started = True
 
-        self.ui.stackedWidget.setCurrentIndex(self.__current_condition_id + 2)
-        self.__set_label_color(self.__target_label_list[self.__currentTargetId], Qt.blue)
+        self.ui.stackedWidget.setCurrentWidget(self.__target_page)
+        self.__set_target_color(self.__currentTargetId, Qt.blue)
         if self.__custom_pointing_technique_active == 1:
             self._setup_pointing_technique()
 
@@ -101,103 +174,234 @@ class PointingExperiment(QtWidgets.QWidget):
 
     def _setup_pointing_technique(self):
 
-        self.__pointing_technique = BubbleCursor(all_targets=self.__all_targets, target_size=self.__circle_radius)
+        # the incremental mode selects exactly the same targets, it only skips the search on small mouse movements
+        self.__pointing_technique = BubbleCursor(all_targets=self.__all_targets, target_size=self.__circle_radius,
+                                                 spatial_index=self.__target_layout.get_spatial_index(
+                                                     get_spatial_index_class(len(self.__target_layout))),
+                                                 incremental=True)
+        # the target page is reused and the new cursor only knows its own overlay, so the bubble and highlight of the
+        # previous condition have to be repainted here
+        self.__get_overlay_widget().update()
 
     def __read_line_from_file(self, setup_file, line_number) -> str:
         with open(setup_file) as file:
             return file.readlines()[line_number]
 
+    def __get_target_page(self):
+        # the page is only created once and then recycled for all conditions (until __release_targets is called)
+        if self.__target_page is None:
+            if self.__render_mode == self.RENDER_MODE_CANVAS:
+                self.__target_canvas = TargetCanvas()
+                self.__target_page = self.__target_canvas
+            else:
+                self.__target_page = QWidget()
+                self.__target_page.setAttribute(Qt.WA_TransparentForMouseEvents)
+            self.ui.stackedWidget.addWidget(self.__target_page)
+        return self.__target_page
+
     def __setup_targets(self):
         self.__circle_radius = self.__counter_balanced_condition_list[self.__current_condition_id]
-        new_widget = QWidget()
-        new_widget.setAttribute(Qt.WA_TransparentForMouseEvents)
-        round_button_stylesheet = "border-color: rgb(66, 69, 183); background-color: rgb(53, 132, 228); " \
-                                  f"border-style: solid; border-radius: {self.__circle_radius}px;"
-        circle_positions = self.__setup_dict["coordinates"].split(";")
-        for i in range(len(circle_positions)):
-            circle_center = circle_positions[i]
-            circle_center = circle_center.replace("(", "")
-            circle_center = circle_center.replace(")", "")
-            circle_center = circle_center.split(",")
-
-            target_label = QLabel(new_widget)
-            target_label.setStyleSheet(round_button_stylesheet)
-            target_label.setFixedSize(self.__circle_radius * 2, self.__circle_radius * 2)
+        # the targets themselves are stored in arrays (shared with the layout), the BubbleCursor only gets lightweight
+        # views of them
+        self.__all_targets = self.__target_layout.get_targets(self.__circle_radius)
+        target_page = self.__get_target_page()
+        if self.__render_mode == self.RENDER_MODE_CANVAS:
+            self.__setup_target_canvas()
+            return
+
+        target_positions = self.__target_layout.get_positions()
+        while len(self.__target_label_list) < len(target_positions):
+            target_label = QLabel(target_page)
+            target_label.setAttribute(Qt.WA_TransparentForMouseEvents)
+            # target_label.setAttribute(Qt.WA_MacShowFocusRect, on=False)
+            target_label.setObjectName(f"button_{len(self.__target_label_list)}")
+            self.__target_label_list.append(target_label)
 
+        if self.__target_label_radius != self.__circle_radius:
+            # parsing the stylesheet is the expensive part, so the pooled labels are only restyled if the radius changes
+            round_button_stylesheet = TARGET_STYLE_SHEET.format(radius=self.__circle_radius)
+            for target_label in self.__target_label_list:
+                target_label.setStyleSheet(round_button_stylesheet)
+                target_label.setFixedSize(self.__circle_radius * 2, self.__circle_radius * 2)
+            self.__target_label_radius = self.__circle_radius
+
+        for target_label, circle_center in zip(self.__target_label_list, target_positions):
             # x and y need to be the top left coordinates of the rectangle that is styled as a circle to position
             # it correctly; because of this we subtract the radius from both to get the top left coordinates
-            x_pos_rect = int(circle_center[0]) - self.__circle_radius
-            y_pos_rect = int(circle_center[1]) - self.__circle_radius
+            x_pos_rect = circle_center[0] - self.__circle_radius
+            y_pos_rect = circle_center[1] - self.__circle_radius
             target_label.move(x_pos_rect, y_pos_rect)
-            target_label.setAttribute(Qt.WA_TransparentForMouseEvents)
-            # target_label.setAttribute(Qt.WA_MacShowFocusRect, on=False)
             self.__set_label_color(target_label, Qt.yellow)
-            target_label.setObjectName(f"button_{i}")
-            self.__target_label_list.append(target_label)
-            target = Target(int(circle_center[0]), int(circle_center[1]), self.__circle_radius)
-            self.__all_targets.append(target)
-        self.ui.stackedWidget.addWidget(new_widget)
+            target_label.show()
+        # labels that are not needed for this layout stay in the pool
+        for target_label in self.__target_label_list[len(target_positions):]:
+            target_label.hide()
+
+    def __setup_target_canvas(self):
+        # the canvas draws the targets from the layout arrays, so building a condition doesn't depend on the number
+        # of targets; it also paints the bubble overlay (this widget is hidden behind the page)
+        self.__target_canvas.set_targets(self.__all_targets)
+        if self.__custom_pointing_technique_active == 1:
+            self.__target_canvas.set_overlay_painter(self.__paint_overlay)
+        if self.__latency_monitor is not None:
+            self.__target_canvas.set_paint_listener(lambda start_ns: self.__latency_monitor.record("paintEvent",
+                                                                                                   start_ns))
+
+    def __release_targets(self):
+        # explicit teardown at the end of a session: removes the target page with all its labels (and their effects)
+        # and drops the pointing technique, so nothing of this session stays alive in a long running process
+        self.__experiment_started = False
+        self.__pointing_technique = None
+        self.__label_colorizer.release()
+        self.__target_label_list = []
+        self.__target_label_radius = None
+        self.__all_targets = []
+        if self.__target_page is not None:
+            self.ui.stackedWidget.removeWidget(self.__target_page)
+            self.__target_page.deleteLater()  # also deletes the labels and effects (children of the page)
+        self.__target_page = None
+        self.__target_canvas = None
+        self.__pending_repaint_region = QRegion()
+        self.__repaint_timer.stop()
 
     def mousePressEvent(self, ev):
+        if self.__latency_monitor is None:
+            self.__handle_mouse_press(ev)
+            return
+        start_ns = perf_counter_ns()
+        self.__latency_monitor.record_event_delay(ev.timestamp(), start_ns)
+        clicked_target_id = self.__handle_mouse_press(ev)
+        self.__latency_monitor.record("mousePressEvent", start_ns)
+        # the marker is taken after the duration of this press was recorded, so a slow click counts for its own target
+        if clicked_target_id is not None and self.__latency_monitor.take_lag_marker():
+            # the UI was lagging while this target was acquired, so its time is not reliable
+            self.__lagging_target_list.append(clicked_target_id)
+
+    def __handle_mouse_press(self, ev):
+        # returns the id of the target that was clicked (None for a missed click)
         if self.__experiment_started:
             if ev.button() == QtCore.Qt.LeftButton:
                 if self.__custom_pointing_technique_active == 1:
                     current_target = self.__all_targets[self.__currentTargetId]
                     currently_selected_target = self.__pointing_technique.selectedTarget
                     if current_target == currently_selected_target:
-                        self.__target_clicked(ev.x(), ev.y())
+                        return self.__target_clicked(ev.x(), ev.y(), ev.timestamp())
                     else:
                         self.__miss_click_count += 1
                 else:
-                    current_target = self.__target_label_list[self.__currentTargetId]
-                    if self.__check_if_point_inside_circle(ev.x(), ev.y(), current_target.x() + self.__circle_radius,
-                                                           current_target.y() + self.__circle_radius,
+                    current_target = self.__all_targets[self.__currentTargetId]
+                    if self.__check_if_point_inside_circle(ev.x(), ev.y(), current_target.x, current_target.y,
                                                            self.__circle_radius):
-                        self.__target_clicked(ev.x(), ev.y())
+                        return self.__target_clicked(ev.x(), ev.y(), ev.timestamp())
                     else:
                         self.__miss_click_count += 1
+        return None
 
     def mouseMoveEvent(self, ev):
+        start_ns = perf_counter_ns()
+        if self.__latency_monitor is None:
+            # every move is a sample for the offset of the event clock (the latency monitor does the same), so the
+            # offset has converged long before the clicks are mapped onto the monotonic clock
+            self.__event_clock.get_event_time_ns(ev.timestamp(), start_ns)
+            self.__handle_mouse_move(ev)
+            return
+        self.__latency_monitor.record_event_delay(ev.timestamp(), start_ns)
+        self.__handle_mouse_move(ev)
+        self.__latency_monitor.record("mouseMoveEvent", start_ns)
+
+    def __handle_mouse_move(self, ev):
         if self.__experiment_started:
+            if self.__trajectory_recorder is not None:
+                self.__trajectory_recorder.record(ev.x(), ev.y())
             if self.__custom_pointing_technique_active == 1:
-                self.__pointing_technique.onMouseMoved(ev)
-            self.update()
-            current_target = self.__target_label_list[self.__currentTargetId]
-            if self.__check_if_point_inside_circle(ev.x(), ev.y(), current_target.x() + self.__circle_radius,
-                                                   current_target.y() + self.__circle_radius, self.__circle_radius):
-                self.__set_label_color(self.__target_label_list[self.__currentTargetId], Qt.darkRed)
+                if self.__latency_monitor is not None:
+                    bubble_start_ns = perf_counter_ns()
+                    self.__pointing_technique.onMouseMoved(ev)
+                    self.__latency_monitor.record("BubbleCursor.onMouseMoved", bubble_start_ns)
+                else:
+                    self.__pointing_technique.onMouseMoved(ev)
+                # only the part the bubble overlay covered (before and after the move) needs to be updated; the
+                # targets repaint themselves when their color changes
+                self.__request_repaint(self.__pointing_technique.dirtyRect)
+            current_target = self.__all_targets[self.__currentTargetId]
+            if self.__check_if_point_inside_circle(ev.x(), ev.y(), current_target.x, current_target.y,
+                                                   self.__circle_radius):
+                self.__set_target_color(self.__currentTargetId, Qt.darkRed)
             else:
-                self.__set_label_color(self.__target_label_list[self.__currentTargetId], Qt.blue)
+                self.__set_target_color(self.__currentTargetId, Qt.blue)
+
+    def __get_overlay_widget(self):
+        # the widget that paints the bubble overlay
+        return self.__target_canvas if self.__target_canvas is not None else self
+
+    def __request_repaint(self, dirty_rect):
+        if dirty_rect.isEmpty():
+            return
+        if not self.__coalesce_repaints:
+            self.__get_overlay_widget().update(dirty_rect)
+            return
+
+        self.__pending_repaint_region = self.__pending_repaint_region.united(dirty_rect)
+        if not self.__repaint_timer.isActive():
+            refresh_rate = self.screen().refreshRate() if self.screen() is not None else 60
+            self.__repaint_timer.start(max(int(1000 / refresh_rate), 1))
+
+    def __repaint_pending_region(self):
+        self.__get_overlay_widget().update(self.__pending_repaint_region)
+        self.__pending_repaint_region = QRegion()
+
+    def __set_target_color(self, target_id, color):
+        if self.__target_canvas is not None:
+            self.__target_canvas.set_target_color(target_id, color)
+        else:
+            self.__set_label_color(self.__target_label_list[target_id], color)
 
     def __set_label_color(self, label, color):
-        color_effect = QGraphicsColorizeEffect()
-        color_effect.setColor(color)
-        label.setGraphicsEffect(color_effect)
+        # reuses the effect of the label and does nothing if the label already has this color
+        self.__label_colorizer.set_color(label, color)
 
     def __mouse_clicked_at(self, pointer_x, pointer_y):
         current_target = self.__targetList[self.__currentTargetId]
 
-    def __target_clicked(self, pointer_x, pointer_y):
-        click_time = time.time()
-        self.__set_label_color(self.__target_label_list[self.__currentTargetId], Qt.yellow)
-        self.__time_per_target_list.append(click_time - self.__last_target_time)
+    def __target_clicked(self, pointer_x, pointer_y, event_timestamp=0):
+        # returns the id of the clicked target
+        clicked_target_id = self.__currentTargetId
+        # the durations are integer nanoseconds, measured until the click happened (not until it was handled)
+        self.__time_per_target_list.append(self.__acquisition_timer.mark(event_timestamp))
+        self.__set_target_color(self.__currentTargetId, Qt.yellow)
         self.__pointer_position_list.append((pointer_x, pointer_y))
-        if self.__currentTargetId < len(self.__target_label_list) - 1:
+        if self.__currentTargetId < len(self.__all_targets) - 1:
             self.__currentTargetId += 1
-            self.__set_label_color(self.__target_label_list[self.__currentTargetId], Qt.blue)
+            self.__set_target_color(self.__currentTargetId, Qt.blue)
         else:
-            self.__experiment_logger.add_new_log_data(self.__participant_id, self.__current_condition_id,
-                                                      self.__pointer_position_list, self.__time_per_target_list,
-                                                      self.__start_time, click_time, self.__miss_click_count,
-                                                      self.__custom_pointing_technique_active == 1)
-            if self.__current_condition_id < len(self.__condition_list) - 1:
-                self.__current_condition_id += 1
-                self.__start_experiment()
-            else:
-                self.ui.stackedWidget.setCurrentIndex(1)
-                self.__experiment_started = False
-
-        self.__last_target_time = click_time
+            # the condition is finished after this press was handled (and its latency recorded), so writing the logs
+            # and setting up the next condition is not measured as part of the click; clicks until then are ignored
+            self.__experiment_started = False
+            self.__condition_end_time = time.time()
+            QTimer.singleShot(0, self.__finish_condition)
+        return clicked_target_id
+
+    def __finish_condition(self):
+        self.__experiment_logger.add_new_log_data(self.__participant_id, self.__current_condition_id,
+                                                  self.__pointer_position_list, self.__time_per_target_list,
+                                                  self.__acquisition_timer.startTimeAsUnix, self.__condition_end_time,
+                                                  self.__acquisition_timer.get_elapsed_ns(),
+                                                  self.__miss_click_count,
+                                                  self.__custom_pointing_technique_active == 1,
+                                                  target_radius=self.__circle_radius)
+        if self.__latency_monitor is not None:
+            self.__experiment_logger.add_latency_summary(self.__participant_id, self.__current_condition_id,
+                                                         self.__acquisition_timer.startTimeAsUnix,
+                                                         self.__latency_monitor.get_summary(),
+                                                         self.__lagging_target_list)
+        if self.__trajectory_recorder is not None:
+            self.__trajectory_recorder.flush(self.__participant_id, self.__current_condition_id)
+        if self.__current_condition_id < len(self.__condition_list) - 1:
+            self.__current_condition_id += 1
+            self.__start_experiment()
+        else:
+            self.ui.stackedWidget.setCurrentIndex(1)
+            self.__release_targets()
 
     # https://www.geeksforgeeks.org/check-two-given-circles-touch-intersect/
     def __check_if_circles_touch(self, center_1_x, center_1_y, center_2_x, center_2_y, radius):
@@ -216,68 +420,108 @@ class PointingExperiment(QtWidgets.QWidget):
             return False
 
     def paintEvent(self, event: QPaintEvent):
-        if self.__experiment_started and self.__custom_pointing_technique_active == 1:
+        # in the canvas mode the bubble is painted by the TargetCanvas (below the targets as well)
+        if self.__experiment_started and self.__custom_pointing_technique_active == 1 and self.__target_canvas is None:
+            start_ns = perf_counter_ns()
             # The QPainter code MUST be in the paintEvent if inheriting from a QWidget!
             # (alternatively a pixmap() could be used as a custom canvas for drawing)
             painter = QtGui.QPainter()
             painter.begin(self)
-            self.__pointing_technique.onPaintEvent(painter)
+            self.__paint_overlay(painter)
             # self.__custom_pointing_technique_active = False
             painter.end()
+            if self.__latency_monitor is not None:
+                self.__latency_monitor.record("paintEvent", start_ns)
+
+    def __paint_overlay(self, painter):
+        if self.__experiment_started:
+            self.__pointing_technique.onPaintEvent(painter)
 
 
 class PointingExperimentLogger:
 
-    def __init__(self):
-        self.__log_file_name = "pointingExperimentLog.csv"
-        self.__study_data = self.__init_study_data()
+    LOG_COLUMNS = ['timestamp', 'participantID', 'condition', 'pointerPositionsPerTarget', 'timesPerTargetInS',
+                   'startTimeAsUnix', 'endTimeAsUnix', 'timeTillFinishedInS', 'missedClickCount',
+                   'bubblePointingTechnique']
 
-    def __init_study_data(self):
-        # check if the file already exists
-        if os.path.isfile(self.__log_file_name):
-            study_data = pd.read_csv(self.__log_file_name)
-        else:
-            study_data = pd.DataFrame(
-                columns=['timestamp', 'participantID', 'condition', 'pointerPositionsPerTarget', 'timesPerTargetInS',
-                         'startTimeAsUnix', 'endTimeAsUnix', 'timeTillFinishedInS', 'missedClickCount',
-                         'bubblePointingTechnique'])
-        return study_data
-
-    def add_new_log_data(self, participant_id, condition, pointer_position_list, time_per_target_list, start_time,
-                         end_time, missed_clicks, bubble_pointing_active):
-
-        self.__study_data = self.__study_data.append({'timestamp': time.time(), 'participantID': participant_id,
-                                                      'condition': condition,
-                                                      'pointerPositionsPerTarget': pointer_position_list,
-                                                      'timesPerTargetInS':
-                                                          time_per_target_list, 'startTimeAsUnix':
-                                                          start_time, 'endTimeAsUnix': end_time, 'timeTillFinishedInS':
-                                                          end_time - start_time, 'missedClickCount': missed_clicks,
-                                                      'bubblePointingTechnique': bubble_pointing_active},
-                                                     ignore_index=True)
-        self.__study_data.to_csv(self.__log_file_name, index=False)
-        with open(self.__log_file_name) as file:
-            print(file.readlines()[-1])
+    LATENCY_COLUMNS = ['participantID', 'condition', 'startTimeAsUnix'] + LatencyMonitor.SUMMARY_COLUMNS + \
+                      ['laggingTargets']
+
+    def __init__(self, fsync_policy=FSYNC_ALWAYS, trial_table_file=None, latency_log_file=None):
+        self.__log_file_name = "pointingExperimentLog.csv"
+        # the sidecar index knows the highest participant id, so the log itself doesn't have to be parsed on startup
+        self.__log_index = LogIndex(self.__log_file_name)
+        self.__max_participant_id = self.__log_index.maxParticipantID
+        # new rows are only appended to the end of the log file (on a background thread)
+        self.__log_writer = AppendOnlyCsvWriter(self.__log_file_name, self.LOG_COLUMNS, fsync_policy=fsync_policy,
+                                                on_rows_written=self.__update_log_index)
+        # optionally the per-target data is also stored in a typed binary table (one row per target acquisition)
+        self.__trial_table_writer = TrialTableWriter(trial_table_file) if trial_table_file is not None else None
+        # optionally the latency summary of every condition is written to a sidecar CSV file (joined to the log by
+        # participantID, condition and startTimeAsUnix)
+        self.__latency_writer = None
+        if latency_log_file is not None:
+            self.__latency_writer = AppendOnlyCsvWriter(latency_log_file, self.LATENCY_COLUMNS,
+                                                        fsync_policy=fsync_policy)
+
+    def __update_log_index(self, rows, log_size):
+        participant_column = self.LOG_COLUMNS.index('participantID')
+        self.__log_index.add_rows([row[participant_column] for row in rows], log_size)
+
+    def add_new_log_data(self, participant_id, condition, pointer_position_list, durations_ns, start_time, end_time,
+                         condition_duration_ns, missed_clicks, bubble_pointing_active, target_radius=0):
+        # the durations are integer nanoseconds of a monotonic clock, start_time and end_time are only used for the
+        # unix timestamps; the seconds in the CSV log are derived from the nanoseconds
+        time_per_target_list = [duration_ns / 1e9 for duration_ns in durations_ns]
+        log_line = self.__log_writer.append([time.time(), participant_id, condition, pointer_position_list,
+                                             time_per_target_list, start_time, end_time, condition_duration_ns / 1e9,
+                                             missed_clicks, bubble_pointing_active])
+        self.__max_participant_id = max(self.__max_participant_id, participant_id)
+        if self.__trial_table_writer is not None:
+            self.__trial_table_writer.add_condition(participant_id, condition, bubble_pointing_active, target_radius,
+                                                    pointer_position_list, durations_ns)
+        print(log_line)
+
+    def add_latency_summary(self, participant_id, condition, start_time, latency_summary, lagging_targets):
+        self.__latency_writer.append([participant_id, condition, start_time] + latency_summary + [lagging_targets])
+
+    def close(self):
+        # waits until all rows have been written to the log file
+        self.__log_writer.close()
+        if self.__trial_table_writer is not None:
+            self.__trial_table_writer.close()
+        if self.__latency_writer is not None:
+            self.__latency_writer.close()
 
     def get_next_participant_id(self):
-        if not math.isnan(self.__study_data["participantID"].max()):
-            return self.__study_data["participantID"].max() + 1
-        else:
-            return 1
+        return self.__max_participant_id + 1
 
 
 if __name__ == '__main__':
     app = QtWidgets.QApplication(sys.argv)
-    try:
-        setup_file_arg = sys.argv[1]
-    except IndexError:
-        print("Please enter your setup_file name as parameter, you can generate one with setup_condition.py")
-        sys.exit(app.exec_())
-    try:
-        use_pointing_technique_arg = int(sys.argv[2])
-    except:
-        print("Please enter if you want to use a pointing technique as second parameter (0=No, 1=Yes)")
-        sys.exit(app.exec_())
-    pointing_experiment = PointingExperiment(setup_file_arg, use_pointing_technique_arg)
+    argument_parser = argparse.ArgumentParser()
+    argument_parser.add_argument("setup_file", help="setup file name (or a layout bundle directory), you can "
+                                                    "generate one with setup_condition.py")
+    argument_parser.add_argument("use_pointing_technique", type=int, choices=[0, 1],
+                                 help="if you want to use a pointing technique (0=No, 1=Yes)")
+    # "canvas" paints all targets in one widget (faster for layouts with many targets)
+    argument_parser.add_argument("render_mode", nargs="?", default=PointingExperiment.RENDER_MODE_LABELS,
+                                 choices=[PointingExperiment.RENDER_MODE_LABELS, PointingExperiment.RENDER_MODE_CANVAS])
+    argument_parser.add_argument("--latency-log", metavar="FILE", default=None,
+                                 help="measure the event handler latencies and write a summary per condition to FILE")
+    argument_parser.add_argument("--kiosk", action="store_true",
+                                 help="run the participants one after another without restarting the application")
+    argument_parser.add_argument("--trial-table", metavar="FILE", default=None,
+                                 help="also append every target acquisition to the binary trial table FILE")
+    argument_parser.add_argument("--trajectory-dir", metavar="DIR", default=None,
+                                 help="record every mouse move and write one trajectory file per condition to DIR")
+    argument_parser.add_argument("--coalesce-repaints", action="store_true",
+                                 help="repaint the bubble overlay at most once per display frame")
+    arguments = argument_parser.parse_args(app.arguments()[1:])
+    pointing_experiment = PointingExperiment(arguments.setup_file, arguments.use_pointing_technique,
+                                             render_mode=arguments.render_mode, latency_log_file=arguments.latency_log,
+                                             kiosk_mode=arguments.kiosk, trial_table_file=arguments.trial_table,
+                                             trajectory_directory=arguments.trajectory_dir,
+                                             coalesce_repaints=arguments.coalesce_repaints)
 
     sys.exit(app.exec_())
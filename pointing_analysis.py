@@ -0,0 +1,242 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Analysis of the pointing experiment log that can be imported in the notebook.
+
+The CSV log stores one row per condition with the click positions and times of all targets as python lists inside a
+single cell. load_trials() reads the log once and explodes these lists into a flat table with one typed row per target
+acquisition. The lists of all rows are parsed with a single NumPy call, so no python code runs per target.
+
+For every target acquisition the movement starts at the center of the previous target, so Fitts' index of difficulty
+can be calculated from the layout: ID = log2(D / W + 1) with the distance D between both centers and the width
+W = 2 * radius. The first target of a condition has no previous target: the experiment moves the mouse to the top left
+corner of the screen, but the log doesn't store where the window was, so its start position is unknown and it is left
+out of the Fitts' law measures (its start, distance and ID are NaN).
+get_fitts_summary() groups the trials by participant x condition x technique and calculates the effective width
+(We = 4.133 * standard deviation of the endpoints along the movement axis), the effective index of difficulty, the
+throughput (IDe / movement time) and the error rates.
+
+The tables are cached in a pickle file next to the log, which is only rebuilt when the log (or any setup file, manifest
+or coordinates file the analysis read) was modified since.
+
+Usage:
+    python3 pointing_analysis.py [log_file] [setup_file_or_bundle]
+"""
+
+import json
+import os
+import sys
+import numpy as np
+import pandas as pd
+from atomic_file import atomic_write
+from setup_condition import get_balanced_condition_list, get_manifest_file, get_setup_file_for_participant, \
+    is_layout_bundle
+from target_layout import TargetLayout
+
+EFFECTIVE_WIDTH_FACTOR = 4.133  # 96% of the endpoints of a normal distribution lie inside of 4.133 standard deviations
+GROUP_COLUMNS = ["participantID", "condition", "bubblePointingTechnique"]
+
+_CACHE_FORMAT_VERSION = 3
+_LIST_SEPARATORS = str.maketrans("[](),", "     ")
+
+
+def load_log(log_file_name: str) -> pd.DataFrame:
+    return pd.read_csv(log_file_name, dtype={"participantID": np.int32, "condition": np.int16,
+                                             "missedClickCount": np.int32, "bubblePointingTechnique": bool})
+
+
+def _get_list_lengths(cells: pd.Series) -> np.ndarray:
+    # number of elements of every "[a, b, ...]" cell (0 for "[]")
+    lengths = cells.str.count(",").to_numpy() + 1
+    lengths[cells.str.len().to_numpy() <= 2] = 0
+    return lengths
+
+
+def _parse_number_lists(cells: pd.Series) -> np.ndarray:
+    # joins all cells into one string and parses all numbers of all lists at once
+    text = " ".join(cells.tolist()).translate(_LIST_SEPARATORS)
+    return np.fromstring(text, dtype=np.float64, sep=" ")
+
+
+def load_setups(setup_path: str, participant_ids) -> tuple:
+    # parses every setup file the participants used exactly once; returns ({participant id: setup file},
+    # {setup file: setup dict}, {setup file: TargetLayout}, {every file that was read: modification time})
+    file_times = {}
+    if is_layout_bundle(setup_path):
+        file_times[get_manifest_file(setup_path)] = os.stat(get_manifest_file(setup_path)).st_mtime_ns
+    setup_file_per_participant = {}
+    setup_dicts = {}
+    layouts = {}
+    for participant_id in participant_ids:
+        setup_file = get_setup_file_for_participant(setup_path, participant_id)
+        setup_file_per_participant[participant_id] = setup_file
+        if setup_file in setup_dicts:
+            continue
+        file_times[setup_file] = os.stat(setup_file).st_mtime_ns
+        with open(setup_file) as json_file:
+            setup_dicts[setup_file] = json.load(json_file)
+        if "coordinatesFile" in setup_dicts[setup_file]:
+            coordinates_file = os.path.join(os.path.dirname(setup_file), setup_dicts[setup_file]["coordinatesFile"])
+            file_times[coordinates_file] = os.stat(coordinates_file).st_mtime_ns
+        layouts[setup_file] = TargetLayout.from_setup(setup_dicts[setup_file], os.path.dirname(setup_file))
+    return setup_file_per_participant, setup_dicts, layouts, file_times
+
+
+def explode_log(df_log: pd.DataFrame, setup_path: str, setups: tuple = None) -> pd.DataFrame:
+    # returns one row per target acquisition; setup_path is the setup file (or layout bundle) the log was recorded with,
+    # setups can be the result of load_setups() for the participants of the log if it was already loaded
+    target_counts = _get_list_lengths(df_log["timesPerTargetInS"])
+    movement_times = _parse_number_lists(df_log["timesPerTargetInS"])
+    positions = _parse_number_lists(df_log["pointerPositionsPerTarget"])
+    if len(movement_times) != target_counts.sum() or len(positions) != 2 * target_counts.sum():
+        raise ValueError("the per-target lists of the log don't have the same length")
+
+    log_rows = np.repeat(np.arange(len(df_log)), target_counts)
+    target_index = np.arange(len(log_rows)) - np.repeat(np.cumsum(target_counts) - target_counts, target_counts)
+    participant_ids = df_log["participantID"].to_numpy(np.int32)
+    conditions = df_log["condition"].to_numpy(np.int16)
+
+    # the layout and the order of the radii only depend on the participant, so they are looked up once per participant
+    if setups is None:
+        setups = load_setups(setup_path, np.unique(participant_ids).tolist())
+    setup_file_per_participant, setup_dicts, layouts, _ = setups
+    layout_ids = {setup_file: layout_id for layout_id, setup_file in enumerate(layouts)}
+    radii_per_participant = {participant_id: get_balanced_condition_list(setup_dicts[setup_file]["circleRadiusList"],
+                                                                         participant_id)
+                             for participant_id, setup_file in setup_file_per_participant.items()}
+    row_radii = np.array([radii_per_participant[participant_id][condition] for participant_id, condition in
+                          zip(participant_ids.tolist(), conditions.tolist())], dtype=np.int32)
+    row_layout_ids = np.array([layout_ids[setup_file_per_participant[participant_id]] for participant_id in
+                               participant_ids.tolist()], dtype=np.int32)
+
+    target_x = np.zeros(len(log_rows), dtype=np.int32)
+    target_y = np.zeros(len(log_rows), dtype=np.int32)
+    trial_layout_ids = row_layout_ids[log_rows]
+    for layout_id, layout in enumerate(layouts.values()):
+        in_layout = trial_layout_ids == layout_id
+        target_x[in_layout] = layout.x[target_index[in_layout]]
+        target_y[in_layout] = layout.y[target_index[in_layout]]
+
+    # every movement starts at the previous target of the same condition, the start of the first one is unknown (the
+    # mouse is moved to the top left corner of the screen, not of the window)
+    start_x = np.roll(target_x, 1).astype(np.float64)
+    start_y = np.roll(target_y, 1).astype(np.float64)
+    first_targets = target_index == 0
+    start_x[first_targets], start_y[first_targets] = np.nan, np.nan
+
+    df_trials = pd.DataFrame({
+        "participantID": participant_ids[log_rows],
+        "condition": conditions[log_rows],
+        "bubblePointingTechnique": df_log["bubblePointingTechnique"].to_numpy(bool)[log_rows],
+        "targetIndex": target_index.astype(np.int32),
+        "targetRadius": row_radii[log_rows],
+        "targetX": target_x,
+        "targetY": target_y,
+        "startX": start_x,
+        "startY": start_y,
+        "clickX": positions[0::2].astype(np.int32),
+        "clickY": positions[1::2].astype(np.int32),
+        "movementTimeInS": movement_times,
+    })
+    return add_fitts_measures(df_trials)
+
+
+def add_fitts_measures(df_trials: pd.DataFrame) -> pd.DataFrame:
+    # adds the per-trial columns for the Fitts' law analysis (the columns of explode_log are needed)
+    delta_x = (df_trials["targetX"] - df_trials["startX"]).to_numpy(np.float64)
+    delta_y = (df_trials["targetY"] - df_trials["startY"]).to_numpy(np.float64)
+    distance = np.hypot(delta_x, delta_y)
+    width = 2 * df_trials["targetRadius"].to_numpy(np.float64)
+    click_offset_x = (df_trials["clickX"] - df_trials["targetX"]).to_numpy(np.float64)
+    click_offset_y = (df_trials["clickY"] - df_trials["targetY"]).to_numpy(np.float64)
+
+    # the endpoint deviation is measured along the movement axis (positive if the click overshot the target center);
+    # all measures that depend on the start position are NaN for the first target of a condition
+    with np.errstate(invalid="ignore", divide="ignore"):
+        endpoint_deviation = np.where(distance > 0, (click_offset_x * delta_x + click_offset_y * delta_y) / distance,
+                                      np.where(np.isnan(distance), np.nan, 0.0))
+        index_of_difficulty = np.log2(distance / width + 1)
+
+    df_trials["distance"] = distance
+    df_trials["width"] = width
+    df_trials["indexOfDifficulty"] = index_of_difficulty
+    df_trials["endpointDeviation"] = endpoint_deviation
+    df_trials["effectiveDistance"] = distance + endpoint_deviation
+    df_trials["clickInsideTarget"] = click_offset_x ** 2 + click_offset_y ** 2 <= df_trials["targetRadius"] ** 2
+    return df_trials
+
+
+def get_fitts_summary(df_trials: pd.DataFrame, df_log: pd.DataFrame) -> pd.DataFrame:
+    # one row per participant x condition x technique; the Fitts' law measures (including the movement time the
+    # throughput is calculated from) only use the trials with a known start position, the counts use all trials
+    df_trials = df_trials.assign(fittsMovementTimeInS=df_trials["movementTimeInS"].where(df_trials["distance"].notna()))
+    df_summary = df_trials.groupby(GROUP_COLUMNS).agg(
+        targetRadius=("targetRadius", "first"),
+        targetCount=("targetIndex", "size"),
+        meanMovementTimeInS=("fittsMovementTimeInS", "mean"),
+        meanDistance=("distance", "mean"),
+        indexOfDifficulty=("indexOfDifficulty", "mean"),
+        endpointDeviationSD=("endpointDeviation", "std"),
+        effectiveDistance=("effectiveDistance", "mean"),
+        clicksInsideTarget=("clickInsideTarget", "sum"),
+    )
+    df_summary["missedClickCount"] = df_log.groupby(GROUP_COLUMNS)["missedClickCount"].sum()
+    df_summary["missedClickCount"] = df_summary["missedClickCount"].fillna(0).astype(np.int64)
+
+    df_summary["effectiveWidth"] = EFFECTIVE_WIDTH_FACTOR * df_summary["endpointDeviationSD"]
+    df_summary["effectiveIndexOfDifficulty"] = np.log2(df_summary["effectiveDistance"] /
+                                                       df_summary["effectiveWidth"] + 1)
+    df_summary["throughputInBitsPerS"] = df_summary["effectiveIndexOfDifficulty"] / df_summary["meanMovementTimeInS"]
+    # missed clicks are all clicks that didn't select the current target; with the BubbleCursor a target can also be
+    # selected with a click outside of it, which is counted separately
+    df_summary["errorRate"] = df_summary["missedClickCount"] / (df_summary["missedClickCount"] +
+                                                                df_summary["targetCount"])
+    df_summary["outsideTargetRate"] = 1 - df_summary["clicksInsideTarget"] / df_summary["targetCount"]
+    return df_summary.reset_index()
+
+
+def _get_cache_key(log_file_name: str, setup_path: str) -> tuple:
+    # the setup files are checked separately (see _are_files_unchanged), as it depends on the log which ones are read
+    log_stat = os.stat(log_file_name)
+    return _CACHE_FORMAT_VERSION, log_stat.st_mtime_ns, log_stat.st_size, os.path.abspath(setup_path)
+
+
+def _are_files_unchanged(file_times: dict) -> bool:
+    try:
+        return all(os.stat(file_name).st_mtime_ns == mtime for file_name, mtime in file_times.items())
+    except OSError:
+        return False
+
+
+def load_trials(log_file_name: str = "pointingExperimentLog.csv", setup_path: str = "setup_json.json",
+                cache_file_name: str = None) -> tuple:
+    # returns (df_log, df_trials, df_summary); the tables are read from the cache as long as the log and the setup
+    # files it was built from haven't changed
+    if cache_file_name is None:
+        cache_file_name = log_file_name + ".analysis.pkl"
+    cache_key = _get_cache_key(log_file_name, setup_path)
+    if os.path.exists(cache_file_name):
+        cache = pd.read_pickle(cache_file_name)
+        if cache.get("key") == cache_key and _are_files_unchanged(cache["setupFiles"]):
+            return cache["log"], cache["trials"], cache["summary"]
+
+    df_log = load_log(log_file_name)
+    setups = load_setups(setup_path, np.unique(df_log["participantID"].to_numpy(np.int32)).tolist())
+    df_trials = explode_log(df_log, setup_path, setups)
+    df_summary = get_fitts_summary(df_trials, df_log)
+
+    with atomic_write(cache_file_name, "wb") as cache_file:
+        pd.to_pickle({"key": cache_key, "setupFiles": setups[3], "log": df_log, "trials": df_trials,
+                      "summary": df_summary}, cache_file)
+    return df_log, df_trials, df_summary
+
+
+if __name__ == '__main__':
+    log_file_arg = sys.argv[1] if len(sys.argv) > 1 else "pointingExperimentLog.csv"
+    setup_path_arg = sys.argv[2] if len(sys.argv) > 2 else "setup_json.json"
+    _, trials, summary = load_trials(log_file_arg, setup_path_arg)
+    print(f"{len(trials)} target acquisitions")
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(summary[GROUP_COLUMNS + ["targetRadius", "indexOfDifficulty", "effectiveWidth", "meanMovementTimeInS",
+                                       "throughputInBitsPerS", "errorRate", "outsideTargetRate"]])
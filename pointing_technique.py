@@ -14,10 +14,12 @@ Concept:
 The main idea behind the "BubbleCursor" is to show a circle-shaped area around the mouse cursor position and to
 dynamically resize it based on the distance to the surrounding targets so that only one target (the one that is closest
 to the mouse cursor) is selectable at any time (because of the resizing the area ALWAYS contains one selectable target
-no matter where the actual cursor is right now). This is done by finding the two closest targets on each mouse move
-and calculating the euclidean distances between the target center and mouse position. The containment distance for the
-closest target and the intersecting distance for the second closest target are calculated as described in the paper
-and the area radius is set to the smaller one of these two distances so the area scales to the minimal necessary size.
+no matter where the actual cursor is right now). This is done by finding the two closest targets on each mouse move,
+i.e. the two targets with the smallest distance between their edge and the mouse position (the euclidean distance to
+the target center minus the target radius, so targets of different sizes are ranked correctly). The containment
+distance for the closest target and the intersecting distance for the second closest target are calculated as
+described in the paper and the area radius is set to the smaller one of these two distances so the area scales to the
+minimal necessary size.
 
 This concept makes it far easier for the user to select the correct target in less time than with a normal cursor
 because the target is clickable from a greater range (effectively the target area is made bigger than it actually is).
@@ -31,78 +33,222 @@ paper above.
 The pointing technique was completely implemented by Michael Meckl.
 """
 
-from PyQt5 import QtWidgets, QtCore, QtGui
+from PyQt5 import QtCore, QtGui
 from PyQt5.QtGui import QMouseEvent, QPainter
 from PyQt5.QtCore import Qt
-from math import inf, sqrt
+from math import ceil, inf, sqrt
+import numpy as np
+from spatial_index import EdgeDistanceIndex
 
 
-class Target(QtWidgets.QWidget):
+class TargetCollection:
+    """
+    Stores the center coordinates and radii of all targets in contiguous NumPy arrays instead of one object per
+    target. Single targets are only handed out as lightweight Target views.
+    """
 
-    def __init__(self, x: int, y: int, size: int):
-        super(Target, self).__init__()
-        self._x = x
-        self._y = y
-        self._s = size
+    def __init__(self, x_positions, y_positions, radii):
+        self.x = np.ascontiguousarray(x_positions, dtype=np.int32)
+        self.y = np.ascontiguousarray(y_positions, dtype=np.int32)
+        self.radius = np.ascontiguousarray(np.broadcast_to(radii, self.x.shape), dtype=np.int32)
 
-        self.selected = False
+    def __len__(self):
+        return len(self.x)
+
+    def __getitem__(self, index: int) -> "Target":
+        if not -len(self.x) <= index < len(self.x):
+            raise IndexError("target index out of range")
+        return Target(self, index % len(self.x))
+
+    def __iter__(self):
+        return (Target(self, index) for index in range(len(self.x)))
+
+
+class Target:
+    """
+    View of a single target inside a TargetCollection. Views don't copy any data, two views are equal if they point
+    to the same target of the same collection.
+    """
+
+    __slots__ = ("_collection", "_index")
+
+    def __init__(self, collection: TargetCollection, index: int):
+        self._collection = collection
+        self._index = index
+
+    def __eq__(self, other):
+        return isinstance(other, Target) and self._collection is other._collection and self._index == other._index
+
+    def __hash__(self):
+        return hash((id(self._collection), self._index))
+
+    @property
+    def index(self):
+        return self._index
 
     @property
     def x(self):
-        return self._x
+        return self._collection.x[self._index].item()
 
     @property
     def y(self):
-        return self._y
+        return self._collection.y[self._index].item()
 
     @property
     def size(self):
-        return self._s
+        return self._collection.radius[self._index].item()
 
 
 class BubbleCursor:
 
-    def __init__(self, all_targets: list, target_size: int, border_size: int = 10):
+    def __init__(self, all_targets: TargetCollection, target_size: int, border_size: int = 10,
+                 spatial_index=None, incremental: bool = False, safety_margin: float = 1.0):
         super(BubbleCursor, self).__init__()
 
+        # every target uses its own size, target_size is only the fallback for target objects without one
         self.__target_radius = target_size
         self.__highlight_border_size = border_size
         self.__all_targets = all_targets
+        # the targets don't move, so the index that is used to find the closest targets only has to be built once;
+        # any index class from spatial_index.py can be passed in (LinearScanIndex is the reference implementation),
+        # or an index that was already built for the centers of these targets. Without one, the fastest index class
+        # for the number of targets is used. The EdgeDistanceIndex ranks the targets
+        # by their edge distance (with an index that also stores the radii if the targets have different sizes).
+        if isinstance(all_targets, TargetCollection):
+            points_x, points_y, radii = all_targets.x.tolist(), all_targets.y.tolist(), all_targets.radius.tolist()
+        else:
+            points_x = [target.x for target in all_targets]
+            points_y = [target.y for target in all_targets]
+            radii = [getattr(target, "size", target_size) for target in all_targets]
+        self.__target_index = EdgeDistanceIndex(points_x, points_y, radii, spatial_index)
+        # the few targets that are looked at on every mouse move are read from plain python lists, which is a lot
+        # faster than going through the NumPy arrays (or the attributes of the target objects)
+        self.__target_x, self.__target_y, self.__target_radii = points_x, points_y, radii
 
         self.__show_highlight = False
         self.__last_x, self.__last_y = None, None  # track the mouse position
-        self.__best_target, self.__second_best_target = None, None  # track targets
+        self.__best_target, self.__second_best_target = None, None  # track targets (by their index)
+        self.__selected_target = None  # the object of the best target, only looked up when the best target changes
         self.__distance_current, self.__distance_best, self.__distance_second_best = inf, inf, inf  # and distances
         self.__bubble_radius = None  # the radius of the area around the cursor
 
+        # incremental mode: the two closest targets stay the same as long as the cursor doesn't leave the region around
+        # the position of the last full search in which no other target can overtake them
+        # (all distances below are distances to the target centers; the targets are ranked by their edge distances)
+        self.__incremental = incremental
+        self.__safety_margin = safety_margin
+        self.__valid_center_x, self.__valid_center_y, self.__valid_radius = None, None, -inf
+        self.__cache_hit_count = 0
+        self.__full_recomputation_count = 0
+
+        # the area of the widget that has to be repainted after the last mouse move (old and new overlay) as
+        # (left, top, right, bottom); the QRect is only created when dirtyRect is read
+        self.__overlay_bounds = None
+        self.__dirty_bounds = None
+
     @property
     def selectedTarget(self):
-        return self.__best_target
+        return self.__selected_target
+
+    @property
+    def selectedTargetIndex(self):
+        # the index of the selected target in all_targets, -1 if there is none
+        return -1 if self.__best_target is None else self.__best_target
+
+    @property
+    def dirtyRect(self) -> QtCore.QRect:
+        if self.__dirty_bounds is None:
+            return QtCore.QRect()
+        left, top, right, bottom = self.__dirty_bounds
+        return QtCore.QRect(left, top, right - left + 1, bottom - top + 1)
+
+    @property
+    def cacheHitCount(self):
+        return self.__cache_hit_count
+
+    @property
+    def fullRecomputationCount(self):
+        return self.__full_recomputation_count
 
     def onMouseMoved(self, event: QMouseEvent):
+        previous_overlay_bounds = self.__overlay_bounds
+
         # save the current mouse position to show an area around it later
         self.__last_x = event.x()
         self.__last_y = event.y()
 
         self._filter(event)
 
-    def _filter(self, mouse_event: QMouseEvent) -> None:
-        # reset targets
-        self.__best_target = None
-        self.__second_best_target = None
+        # only the area that was covered by the old bubble and highlight and the area of the new ones has to be
+        # repainted, not the whole widget
+        self.__overlay_bounds = self._get_overlay_bounds()
+        self.__dirty_bounds = self._unite_bounds(previous_overlay_bounds, self.__overlay_bounds)
 
-        # reset the distances to a large value (infinity), so the algorithm to find the nearest two targets will work
-        self.__distance_current, self.__distance_best, self.__distance_second_best = inf, inf, inf
+    def _get_overlay_bounds(self):
+        # the bounds of the bubble and the highlight (None if nothing is drawn)
+        if self.__last_x is None:
+            return None
+
+        overlay_bounds = None
+        if self.__bubble_radius is not None:
+            overlay_bounds = self._get_circle_bounds(self.__last_x, self.__last_y, self.__bubble_radius - 2)
+        if self.__show_highlight and self.__best_target is not None:
+            overlay_bounds = self._unite_bounds(overlay_bounds, self._get_circle_bounds(
+                self.__target_x[self.__best_target], self.__target_y[self.__best_target],
+                self.__target_radii[self.__best_target] + self.__highlight_border_size))
+        return overlay_bounds
+
+    @staticmethod
+    def _get_circle_bounds(center_x: int, center_y: int, radius: float):
+        if radius <= 0 or radius == inf:
+            return None
+        # add a pixel on each side so the antialiased edge of the ellipse is covered as well
+        radius = int(ceil(radius)) + 1
+        return center_x - radius, center_y - radius, center_x + radius, center_y + radius
+
+    @staticmethod
+    def _unite_bounds(bounds, other_bounds):
+        if bounds is None:
+            return other_bounds
+        if other_bounds is None:
+            return bounds
+        return (min(bounds[0], other_bounds[0]), min(bounds[1], other_bounds[1]), max(bounds[2], other_bounds[2]),
+                max(bounds[3], other_bounds[3]))
 
-        # find the two closest targets to the mouse pointer
-        self._find_nearest_targets(mouse_event.x(), mouse_event.y())
-        # self._debug()
+    def _filter(self, mouse_event: QMouseEvent) -> None:
+        pos_x, pos_y = mouse_event.x(), mouse_event.y()
+        if self.__incremental and self._is_inside_valid_region(pos_x, pos_y):
+            # the closest two targets can't have changed, only their distances to the mouse pointer have to be updated
+            self.__cache_hit_count += 1
+            self.__distance_best = self._get_distance(self.__best_target, pos_x, pos_y)
+            if self.__second_best_target is not None:
+                self.__distance_second_best = self._get_distance(self.__second_best_target, pos_x, pos_y)
+        else:
+            # reset targets
+            previous_best_target = self.__best_target
+            self.__best_target = None
+            self.__second_best_target = None
+
+            # reset the distances to a large value (infinity), so the algorithm to find the nearest two targets will
+            # work
+            self.__distance_current, self.__distance_best, self.__distance_second_best = inf, inf, inf
+
+            # find the two closest targets to the mouse pointer
+            self.__full_recomputation_count += 1
+            self._find_nearest_targets(pos_x, pos_y)
+            if self.__best_target != previous_best_target:
+                self.__selected_target = None if self.__best_target is None else self.__all_targets[self.__best_target]
+            # self._debug()
 
         # adjust the bubble size based on the two closest targets intersecting and containment distances;
         # see Grossman & Balakrishnan (2005)
-        # TODO (second_)best_target.size statt self.__target_radius, damit dynamische Größe möglich wäre
-        containment_distance_best = self.__distance_best + self.__target_radius
-        intersecting_distance_second_best = self.__distance_second_best - self.__target_radius
+        containment_distance_best = inf
+        if self.__best_target is not None:
+            containment_distance_best = self.__distance_best + self.__target_radii[self.__best_target]
+        intersecting_distance_second_best = inf
+        if self.__second_best_target is not None:
+            intersecting_distance_second_best = self.__distance_second_best - \
+                self.__target_radii[self.__second_best_target]
         self.__bubble_radius = min(containment_distance_best, intersecting_distance_second_best)
 
         if containment_distance_best > intersecting_distance_second_best:
@@ -110,36 +256,52 @@ class BubbleCursor:
             self.__show_highlight = True
 
     def _find_nearest_targets(self, pos_x: int, pos_y: int) -> None:
-        for i in range(0, len(self.__all_targets)):
-            # get the target at position i
-            current_target = self.__all_targets[i]
-            # get the euclidean distance between mouse position and the current target center
-            self.__distance_current = sqrt((current_target.x - pos_x) ** 2 + (current_target.y - pos_y) ** 2)
-
-            if self.__distance_current < self.__distance_best:
-                if self.__best_target is not None:
-                    # if the closest (i.e. the best) target already exists and a target with a smaller distance is
-                    # found, save the currently best target as second best target before overwriting it
-                    self.__second_best_target = self.__best_target
-                    self.__distance_second_best = self.__distance_best
-
-                # a smaller distance than the best one has been found; replace the best target with the current target
-                self.__best_target = current_target
-                self.__distance_best = self.__distance_current
-
-            elif self.__distance_current < self.__distance_second_best:
-                # if the current distance is at least better (i.e. smaller) than the currently second smallest,
-                # update the second best target
-                self.__second_best_target = current_target
-                self.__distance_second_best = self.__distance_current
+        # the index returns the two targets with the smallest edge distances (center distance minus radius) to the
+        # mouse position
+        # (in incremental mode the third closest target is needed as well to calculate the valid region)
+        nearest = self.__target_index.nearest(pos_x, pos_y, 3 if self.__incremental else 2)
+        if len(nearest) > 0:
+            self.__best_target = nearest[0][1]
+            self.__distance_best = nearest[0][0] + self.__target_radii[self.__best_target]
+        if len(nearest) > 1:
+            self.__second_best_target = nearest[1][1]
+            self.__distance_second_best = nearest[1][0] + self.__target_radii[self.__second_best_target]
+
+        if self.__incremental:
+            self._update_valid_region(pos_x, pos_y, [edge_distance for edge_distance, _ in nearest])
+
+    def _update_valid_region(self, pos_x: int, pos_y: int, distances: list) -> None:
+        # Moving the cursor by d changes the (edge) distance to every target by at most d. As long as the cursor stays
+        # closer than half of the smallest gap between the 1st/2nd and the 2nd/3rd closest target to this position,
+        # neither the best nor the second best target can be overtaken (this is the intersection of the Voronoi cells
+        # of both targets in the order-2 (additively weighted) Voronoi diagram, approximated by a disc and shrunk by
+        # the safety margin).
+        distances = distances + [inf] * (3 - len(distances))
+        if distances[0] == inf:
+            self.__valid_radius = -inf
+            return
+        gaps = [distances[1] - distances[0]]
+        if distances[1] != inf:
+            gaps.append(distances[2] - distances[1])
+        self.__valid_center_x, self.__valid_center_y = pos_x, pos_y
+        self.__valid_radius = min(gaps) / 2 - self.__safety_margin
+
+    def _is_inside_valid_region(self, pos_x: int, pos_y: int) -> bool:
+        if self.__valid_radius <= 0:
+            return False
+        return (pos_x - self.__valid_center_x) ** 2 + (pos_y - self.__valid_center_y) ** 2 < self.__valid_radius ** 2
+
+    def _get_distance(self, target_index: int, pos_x: int, pos_y: int) -> float:
+        return sqrt((self.__target_x[target_index] - pos_x) ** 2 + (self.__target_y[target_index] - pos_y) ** 2)
 
     def _debug(self) -> None:
         if self.__best_target is None or self.__second_best_target is None:
             return
         print(f"currentMousePos: x={self.__last_x}, y={self.__last_y}")
-        print(f"BestTarget: x={self.__best_target.x}, y={self.__best_target.y}")
-        print(f"SecondBestTarget: x={self.__second_best_target.x}, y={self.__second_best_target.y}")
-        print("All Targets:", [coords for coords in map(lambda x: [x.x, x.y], self.__all_targets)])
+        print(f"BestTarget: x={self.__target_x[self.__best_target]}, y={self.__target_y[self.__best_target]}")
+        print(f"SecondBestTarget: x={self.__target_x[self.__second_best_target]}, "
+              f"y={self.__target_y[self.__second_best_target]}")
+        print("All Targets:", [list(coordinates) for coordinates in zip(self.__target_x, self.__target_y)])
 
     def onPaintEvent(self, painter: QPainter):
         if self.__last_x is None:
@@ -184,7 +346,7 @@ class BubbleCursor:
         brush.setStyle(Qt.SolidPattern)
         painter.setBrush(brush)
 
-        highlight_radius = self.__target_radius + self.__highlight_border_size
-        rect_x = self.__best_target.x
-        rect_y = self.__best_target.y
+        highlight_radius = self.__target_radii[self.__best_target] + self.__highlight_border_size
+        rect_x = self.__target_x[self.__best_target]
+        rect_y = self.__target_y[self.__best_target]
         painter.drawEllipse(QtCore.QPoint(rect_x, rect_y), highlight_radius, highlight_radius)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+# Form implementation generated from reading ui file 'pointing.ui'
+#
+# Created by: PyQt5 UI code generator 5.15.11
+#
+# WARNING: Any manual changes made to this file will be lost when pyuic5 is
+# run again.  Do not edit this file unless you know what you are doing.
+
+
+from PyQt5 import QtCore, QtGui, QtWidgets
+
+
+class Ui_main_window(object):
+    def setupUi(self, main_window):
+        main_window.setObjectName("main_window")
+        main_window.resize(800, 600)
+        main_window.setStyleSheet("QPushButton {\n"
+"\n"
+"}")
+        self.stackedWidget = QtWidgets.QStackedWidget(main_window)
+        self.stackedWidget.setGeometry(QtCore.QRect(0, 0, 800, 600))
+        self.stackedWidget.setMouseTracking(True)
+        self.stackedWidget.setObjectName("stackedWidget")
+        self.startPage = QtWidgets.QWidget()
+        self.startPage.setMouseTracking(True)
+        self.startPage.setObjectName("startPage")
+        self.welcomeText = QtWidgets.QLabel(self.startPage)
+        self.welcomeText.setGeometry(QtCore.QRect(10, 10, 681, 261))
+        self.welcomeText.setWordWrap(True)
+        self.welcomeText.setObjectName("welcomeText")
+        self.startExperimentButton = QtWidgets.QPushButton(self.startPage)
+        self.startExperimentButton.setGeometry(QtCore.QRect(10, 240, 151, 41))
+        self.startExperimentButton.setObjectName("startExperimentButton")
+        self.participantIdTextBox = QtWidgets.QPlainTextEdit(self.startPage)
+        self.participantIdTextBox.setGeometry(QtCore.QRect(110, 520, 61, 31))
+        self.participantIdTextBox.setObjectName("participantIdTextBox")
+        self.participantIdLabel = QtWidgets.QLabel(self.startPage)
+        self.participantIdLabel.setGeometry(QtCore.QRect(10, 530, 111, 19))
+        self.participantIdLabel.setObjectName("participantIdLabel")
+        self.participantIdInfo = QtWidgets.QLabel(self.startPage)
+        self.participantIdInfo.setGeometry(QtCore.QRect(180, 530, 521, 19))
+        self.participantIdInfo.setObjectName("participantIdInfo")
+        self.stackedWidget.addWidget(self.startPage)
+        self.EndPage = QtWidgets.QWidget()
+        self.EndPage.setMouseTracking(True)
+        self.EndPage.setObjectName("EndPage")
+        self.thankYouText = QtWidgets.QLabel(self.EndPage)
+        self.thankYouText.setGeometry(QtCore.QRect(180, 90, 291, 171))
+        self.thankYouText.setObjectName("thankYouText")
+        self.closeButton = QtWidgets.QPushButton(self.EndPage)
+        self.closeButton.setGeometry(QtCore.QRect(290, 330, 88, 27))
+        self.closeButton.setObjectName("closeButton")
+        self.nextParticipantButton = QtWidgets.QPushButton(self.EndPage)
+        self.nextParticipantButton.setGeometry(QtCore.QRect(390, 330, 131, 27))
+        self.nextParticipantButton.setObjectName("nextParticipantButton")
+        self.stackedWidget.addWidget(self.EndPage)
+
+        self.retranslateUi(main_window)
+        self.stackedWidget.setCurrentIndex(0)
+        QtCore.QMetaObject.connectSlotsByName(main_window)
+
+    def retranslateUi(self, main_window):
+        _translate = QtCore.QCoreApplication.translate
+        main_window.setWindowTitle(_translate("main_window", "Form"))
+        self.welcomeText.setText(_translate("main_window", "Welcome and thanks for participating in our pointer experiment.\n"
+" This experiment will measure how long you need to click on circles on the screen. Please click the on the blue marked circles as fast as you can \n"
+" There will be 2 rounds.\n"
+" One with big and one with smaller circles. \n"
+"The the second round will start immediatelly after you finished the first round,\n"
+" the first round will start when you click the button below.\n"
+" Your cursor will be move to the top left corner of the window for both rounds"))
+        self.startExperimentButton.setText(_translate("main_window", "Start"))
+        self.participantIdLabel.setText(_translate("main_window", "Participant ID:"))
+        self.participantIdInfo.setText(_translate("main_window", "(This should allready be set correctly; do not touch if you are not instructed to)"))
+        self.thankYouText.setText(_translate("main_window", "Thank you for participating!!!"))
+        self.closeButton.setText(_translate("main_window", "Close"))
+        self.nextParticipantButton.setText(_translate("main_window", "Next participant"))
+
+
+UI_FILE_HASH = '6c71dba1252697c6971fc370750d525901dd24d0'
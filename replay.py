@@ -0,0 +1,223 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Headless replay engine for the target selection of the pointing experiment.
+
+Mouse traces are fed directly into the BubbleCursor and into the plain circle hit test of the experiment, so no
+QApplication (and no human at the mouse) is needed. A trace is either recorded with the TrajectoryRecorder or
+generated synthetically from a setup file: the cursor moves from target to target with minimum-jerk trajectories
+whose movement time follows Fitts' law, and clicks with a normally distributed endpoint error.
+
+For every run the throughput (events per second), the p50/p99 latency per event and the sequence of selected targets
+are reported. Because every spatial index backend has to select exactly the same targets, the replay also works as a
+regression check whenever the selection code is optimized.
+
+Usage:
+    python3 replay.py <setup_file> [trace_file.npy]
+"""
+
+import json
+import math
+import os
+import sys
+from time import perf_counter_ns
+import numpy as np
+from pointing_technique import BubbleCursor, TargetCollection
+from spatial_index import SPATIAL_INDEXES, LinearScanIndex
+from target_layout import TargetLayout
+
+TRACE_DTYPE = np.dtype([
+    ("timestampNs", np.int64),
+    ("x", np.int32),
+    ("y", np.int32),
+    ("click", np.bool_),
+    ("targetIndex", np.int32),  # the target the cursor is moving to (-1 if unknown)
+])
+
+# Fitts' law parameters (MT = a + b * log2(D / W + 1)) used for the synthetic traces
+FITTS_A_IN_S = 0.1
+FITTS_B_IN_S = 0.15
+
+
+class _ReplayMouseEvent:
+    # stands in for a QMouseEvent; a single instance is reused for all events of a replay
+
+    __slots__ = ("_x", "_y")
+
+    def __init__(self):
+        self._x, self._y = 0, 0
+
+    def x(self):
+        return self._x
+
+    def y(self):
+        return self._y
+
+
+class ReplayResult:
+
+    def __init__(self, name: str, latencies_ns: np.ndarray, selected_targets: np.ndarray,
+                 clicked_targets: list, missed_click_count: int):
+        self.name = name
+        self.latenciesNs = latencies_ns
+        self.selectedTargets = selected_targets  # index of the selected target for every event (-1 if none)
+        self.clickedTargets = clicked_targets  # the selected target at every click
+        self.missedClickCount = missed_click_count
+
+    @property
+    def eventsPerSecond(self):
+        total_ns = self.latenciesNs.sum()
+        return len(self.latenciesNs) / (total_ns / 1e9) if total_ns > 0 else math.inf
+
+    def get_latency_percentile_ns(self, percentile: float) -> float:
+        return float(np.percentile(self.latenciesNs, percentile)) if len(self.latenciesNs) else 0.0
+
+    def get_summary(self) -> str:
+        return (f"{self.name}: {self.eventsPerSecond:,.0f} events/s, "
+                f"p50 {self.get_latency_percentile_ns(50) / 1000:.2f} us, "
+                f"p99 {self.get_latency_percentile_ns(99) / 1000:.2f} us, "
+                f"{len(self.clickedTargets)} clicks, {self.missedClickCount} missed")
+
+
+def load_targets(setup_file: str) -> tuple:
+    # returns the target centers and the list of radii (conditions) of a setup file
+    with open(setup_file) as json_file:
+        setup_dict = json.load(json_file)
+    target_layout = TargetLayout.from_setup(setup_dict, os.path.dirname(setup_file))
+    return target_layout.x.tolist(), target_layout.y.tolist(), setup_dict["circleRadiusList"]
+
+
+def generate_fitts_trace(x_positions, y_positions, target_radius: int, sampling_rate_hz: int = 1000,
+                         seed: int = 0, start_position: tuple = (0, 0)) -> np.ndarray:
+    # the targets are clicked in order, starting at the top left corner (as in the experiment)
+    rng = np.random.default_rng(seed)
+    target_width = 2 * target_radius
+    # the endpoints are normally distributed around the target center; by definition 96% of the clicks of a
+    # participant fall inside the effective width We = 4.133 * sd
+    endpoint_sd = target_width / 4.133
+
+    segments = []
+    current_x, current_y = start_position
+    time_ns = 0
+    for target_index, (target_x, target_y) in enumerate(zip(x_positions, y_positions)):
+        end_x = target_x + rng.normal(0, endpoint_sd)
+        end_y = target_y + rng.normal(0, endpoint_sd)
+        distance = math.hypot(end_x - current_x, end_y - current_y)
+        movement_time = FITTS_A_IN_S + FITTS_B_IN_S * math.log2(distance / target_width + 1)
+        sample_count = max(int(movement_time * sampling_rate_hz), 2)
+
+        # minimum-jerk position profile: s(t) = 10t^3 - 15t^4 + 6t^5
+        progress = np.linspace(0, 1, sample_count)[1:]
+        progress = 10 * progress ** 3 - 15 * progress ** 4 + 6 * progress ** 5
+        segment = np.zeros(len(progress), dtype=TRACE_DTYPE)
+        segment["x"] = np.rint(current_x + (end_x - current_x) * progress)
+        segment["y"] = np.rint(current_y + (end_y - current_y) * progress)
+        segment["timestampNs"] = time_ns + np.rint(np.arange(1, sample_count) * 1e9 / sampling_rate_hz)
+        segment["click"][-1] = True
+        segment["targetIndex"] = target_index
+        segments.append(segment)
+
+        current_x, current_y = segment["x"][-1], segment["y"][-1]
+        time_ns = int(segment["timestampNs"][-1])
+    return np.concatenate(segments) if segments else np.zeros(0, dtype=TRACE_DTYPE)
+
+
+def load_recorded_trace(file_name: str) -> np.ndarray:
+    # recorded trajectories contain only mouse moves, so there are no clicks in the replay
+    events = np.load(file_name)
+    trace = np.zeros(len(events), dtype=TRACE_DTYPE)
+    trace["targetIndex"] = -1
+    for column in ("timestampNs", "x", "y"):
+        trace[column] = events[column]
+    return trace
+
+
+def replay_bubble_cursor(trace: np.ndarray, targets: TargetCollection, target_radius: int,
+                         spatial_index=LinearScanIndex, incremental: bool = False, name: str = None) -> ReplayResult:
+    bubble_cursor = BubbleCursor(all_targets=targets, target_size=target_radius, spatial_index=spatial_index,
+                                 incremental=incremental)
+    event = _ReplayMouseEvent()
+    latencies_ns = np.zeros(len(trace), dtype=np.int64)
+    selected_targets = np.full(len(trace), -1, dtype=np.int64)
+    clicked_targets = []
+    missed_click_count = 0
+
+    for i, (x, y, click, target_index) in enumerate(zip(trace["x"].tolist(), trace["y"].tolist(),
+                                                        trace["click"].tolist(), trace["targetIndex"].tolist())):
+        event._x, event._y = x, y
+        start = perf_counter_ns()
+        bubble_cursor.onMouseMoved(event)
+        latencies_ns[i] = perf_counter_ns() - start
+
+        selected_targets[i] = bubble_cursor.selectedTargetIndex
+        if click:
+            clicked_targets.append(int(selected_targets[i]))
+            if selected_targets[i] != target_index:
+                missed_click_count += 1
+    return ReplayResult(name or f"BubbleCursor ({spatial_index.__name__})", latencies_ns, selected_targets,
+                        clicked_targets, missed_click_count)
+
+
+def replay_plain_cursor(trace: np.ndarray, targets: TargetCollection, target_radius: int) -> ReplayResult:
+    # the same hit test as PointingExperiment: only the target the cursor is moving to can be hit
+    latencies_ns = np.zeros(len(trace), dtype=np.int64)
+    selected_targets = np.full(len(trace), -1, dtype=np.int64)
+    clicked_targets = []
+    missed_click_count = 0
+    target_x_positions, target_y_positions = targets.x.tolist(), targets.y.tolist()
+
+    for i, (x, y, click, target_index) in enumerate(zip(trace["x"].tolist(), trace["y"].tolist(),
+                                                        trace["click"].tolist(), trace["targetIndex"].tolist())):
+        start = perf_counter_ns()
+        hit = target_index >= 0 and (x - target_x_positions[target_index]) ** 2 + \
+            (y - target_y_positions[target_index]) ** 2 <= target_radius ** 2
+        latencies_ns[i] = perf_counter_ns() - start
+
+        selected_targets[i] = target_index if hit else -1
+        if click:
+            clicked_targets.append(int(selected_targets[i]))
+            if not hit:
+                missed_click_count += 1
+    return ReplayResult("Plain cursor", latencies_ns, selected_targets, clicked_targets, missed_click_count)
+
+
+def compare_backends(trace: np.ndarray, targets: TargetCollection, target_radius: int) -> list:
+    # replays the trace with every spatial index (with and without the incremental mode) and compares the selected
+    # targets with the linear scan; returns the results and raises an AssertionError if any selection differs
+    reference = replay_bubble_cursor(trace, targets, target_radius, LinearScanIndex, name="reference (linear)")
+    results = [reference]
+    for spatial_index in SPATIAL_INDEXES.values():
+        for incremental in (False, True):
+            result = replay_bubble_cursor(trace, targets, target_radius, spatial_index, incremental,
+                                          f"{spatial_index.__name__}{' incremental' if incremental else ''}")
+            if not np.array_equal(result.selectedTargets, reference.selectedTargets):
+                first_difference = int(np.flatnonzero(result.selectedTargets != reference.selectedTargets)[0])
+                raise AssertionError(f"{result.name} selects a different target than the linear scan at event "
+                                     f"{first_difference}")
+            results.append(result)
+    return results
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python3 replay.py <setup_file> [trace_file.npy]")
+        sys.exit(1)
+    replay_x_positions, replay_y_positions, radius_list = load_targets(sys.argv[1])
+
+    for radius in radius_list:
+        replay_targets = TargetCollection(replay_x_positions, replay_y_positions, radius)
+        if len(sys.argv) > 2:
+            replay_trace = load_recorded_trace(sys.argv[2])
+        else:
+            replay_trace = generate_fitts_trace(replay_x_positions, replay_y_positions, radius)
+        print(f"Target radius {radius}, {len(replay_trace)} events:")
+        print("  " + replay_plain_cursor(replay_trace, replay_targets, radius).get_summary())
+        try:
+            replay_results = compare_backends(replay_trace, replay_targets, radius)
+        except AssertionError as error:
+            print(f"  REGRESSION: {error}")
+            sys.exit(1)
+        for replay_result in replay_results:
+            print("  " + replay_result.get_summary())
+        print(f"  Clicked targets: {replay_results[0].clickedTargets}")
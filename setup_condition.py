@@ -1,48 +1,241 @@
-import random
+import itertools
+import math
+import os
 import sys
 import json
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 
 WINDOW_HEIGHT = 600
 WINDOW_WIDTH = 800
+MANIFEST_FILE_NAME = "manifest.json"
 
 
-def __create_new_random_coords(max_circle_radius):
-    x_pos = random.randint(max_circle_radius, WINDOW_WIDTH-max_circle_radius)
-    y_pos = random.randint(max_circle_radius, WINDOW_HEIGHT-max_circle_radius)
-    new_coord = (x_pos, y_pos)
-    return new_coord
+def get_balanced_condition_list(condition_list, participant_id):
+    condition_count = len(condition_list)
 
+    # First we need to create a balanced latin square according to our number of conditions:
+    # https://medium.com/@graycoding/balanced-latin-squares-in-python-2c3aa6ec95b9
+    balanced_order = [[((j // 2 + 1 if j % 2 else condition_count - j // 2) + i) % condition_count + 1 for j in
+                       range(condition_count)] for i in range(condition_count)]
+    if condition_count % 2:  # Repeat reversed for odd n
+        balanced_order += [seq[::-1] for seq in balanced_order]
+    order_for_participant = balanced_order[participant_id % condition_count]
 
-def __create_circle_coordinates(number_of_circles, circle_radius_list):
-    coord_list = []
-    coord_string = ""
-    print(circle_radius_list)
-    for circle in range(int(number_of_circles)):
-        new_coord = __create_new_random_coords(max(circle_radius_list))
-        while new_coord in coord_list:
-            new_coord = __create_new_random_coords(max(circle_radius_list))
-        coord_list.append(new_coord)
-        coord_string += f"({new_coord[0]},{new_coord[1]});"
-    print(coord_string)
+    # Now we will reorder our conditions-list with the balanced-latin-square order we created above
+    # https://stackoverflow.com/questions/2177590/how-can-i-reorder-a-list/2177607
+    for i in range(len(order_for_participant)):
+        order_for_participant[i] -= 1
+
+    return [condition_list[i] for i in order_for_participant]
+
+
+def generate_layout(number_of_circles, circle_radius_list, window_width=WINDOW_WIDTH, window_height=WINDOW_HEIGHT,
+                    seed=None, min_gap=0):
+    """
+    Places the circle centers randomly (integer coordinates) so that no two circles overlap even with the biggest
+    radius, i.e. all centers are at least 2 * max(circle_radius_list) + min_gap apart.
+
+    This is a grid-hashed dart throwing (Poisson-disk) sampler: the window is divided into cells with a diagonal of
+    the minimum distance, so every cell can hold at most one center and only the 5x5 surrounding cells have to be
+    checked for conflicts. Candidates are generated and checked in vectorized batches; candidates whose cells are
+    5 cells apart in both directions can never conflict with each other, so the batch is checked in 25 interleaved
+    phases. This takes roughly linear time in the number of circles.
+    Raises a ValueError if the circles don't fit into the window.
+    """
+    number_of_circles = int(number_of_circles)
+    max_radius = max(circle_radius_list)
+    min_distance = 2 * max_radius + min_gap
+    min_distance_sq = min_distance ** 2
+    if window_width < 2 * max_radius or window_height < 2 * max_radius:
+        raise ValueError(f"Circles with a radius of {max_radius} don't fit into a {window_width}x{window_height} window")
+
+    rng = np.random.default_rng(seed)
+    cell_size = max(min_distance / math.sqrt(2), 1e-9)
+    padding = 2  # empty cells around the grid, so the neighbour lookups never leave the grid
+    column_count = int(window_width // cell_size) + 1 + 2 * padding
+    row_count = int(window_height // cell_size) + 1 + 2 * padding
+    grid = np.full((row_count, column_count), -1, dtype=np.int64)  # index of the center in each cell (-1 = empty)
+    x_positions = np.zeros(number_of_circles, dtype=np.int64)
+    y_positions = np.zeros(number_of_circles, dtype=np.int64)
+    neighbour_offsets = [(row, column) for row in range(-2, 3) for column in range(-2, 3) if (row, column) != (0, 0)]
+
+    placed_count = 0
+    failed_rounds = 0
+    while placed_count < number_of_circles:
+        batch_size = min(4 * (number_of_circles - placed_count) + 256, 1000000)
+        candidate_x = rng.integers(max_radius, window_width - max_radius, size=batch_size, endpoint=True)
+        candidate_y = rng.integers(max_radius, window_height - max_radius, size=batch_size, endpoint=True)
+        candidate_column = (candidate_x // cell_size).astype(np.int64) + padding
+        candidate_row = (candidate_y // cell_size).astype(np.int64) + padding
+
+        # only one candidate per empty cell
+        is_empty = grid[candidate_row, candidate_column] < 0
+        _, first_in_cell = np.unique(candidate_row[is_empty] * column_count + candidate_column[is_empty],
+                                     return_index=True)
+        keep = np.flatnonzero(is_empty)[np.sort(first_in_cell)]
+        candidate_x, candidate_y = candidate_x[keep], candidate_y[keep]
+        candidate_column, candidate_row = candidate_column[keep], candidate_row[keep]
+
+        placed_before_round = placed_count
+        for phase_row in range(5):
+            for phase_column in range(5):
+                in_phase = np.flatnonzero((candidate_row % 5 == phase_row) & (candidate_column % 5 == phase_column))
+                phase_x, phase_y = candidate_x[in_phase], candidate_y[in_phase]
+                phase_row_cells, phase_column_cells = candidate_row[in_phase], candidate_column[in_phase]
+                conflict = np.zeros(len(in_phase), dtype=bool)
+                for row_offset, column_offset in neighbour_offsets:
+                    neighbour = grid[phase_row_cells + row_offset, phase_column_cells + column_offset]
+                    occupied = neighbour >= 0
+                    neighbour = neighbour[occupied]
+                    distance_sq = (x_positions[neighbour] - phase_x[occupied]) ** 2 + \
+                                  (y_positions[neighbour] - phase_y[occupied]) ** 2
+                    conflict[np.flatnonzero(occupied)[distance_sq < min_distance_sq]] = True
 
-    coord_string = coord_string[:-1]  # remove last ";" from string
-    return coord_string
+                accepted = np.flatnonzero(~conflict)[:number_of_circles - placed_count]
+                new_indices = np.arange(placed_count, placed_count + len(accepted))
+                x_positions[new_indices] = phase_x[accepted]
+                y_positions[new_indices] = phase_y[accepted]
+                grid[phase_row_cells[accepted], phase_column_cells[accepted]] = new_indices
+                placed_count += len(accepted)
 
+        failed_rounds = failed_rounds + 1 if placed_count == placed_before_round else 0
+        if failed_rounds >= 20:
+            raise ValueError(f"Could only place {placed_count} of {number_of_circles} circles with a radius of "
+                             f"{max_radius} in a {window_width}x{window_height} window")
 
-def __write_config_to_file(number_of_circles, circle_radius, file_name):
-    coord_string = __create_circle_coordinates(number_of_circles, circle_radius)
-    setup_data_dict = {"numberOfCircles": number_of_circles, "circleRadiusList": circle_radius, "coordinates": coord_string}
+    # the centers are placed phase by phase, so shuffle them to get a random target order
+    order = rng.permutation(number_of_circles)
+    return x_positions[order], y_positions[order]
+
+
+def __create_circle_coordinates(number_of_circles, circle_radius_list, window_width=WINDOW_WIDTH,
+                                window_height=WINDOW_HEIGHT, seed=None):
+    print(circle_radius_list)
+    x_positions, y_positions = generate_layout(number_of_circles, circle_radius_list, window_width, window_height,
+                                               seed)
+    coordinates = [[x, y] for x, y in zip(x_positions.tolist(), y_positions.tolist())]
+    print(coordinates)
+    return coordinates
+
+
+def __write_config_to_file(number_of_circles, circle_radius, file_name, window_width=WINDOW_WIDTH,
+                           window_height=WINDOW_HEIGHT, seed=None):
+    coordinates = __create_circle_coordinates(number_of_circles, circle_radius, window_width, window_height, seed)
+    setup_data_dict = {"numberOfCircles": number_of_circles, "circleRadiusList": circle_radius, "coordinates": coordinates}
     with open(file_name, "w") as file:
         json.dump(setup_data_dict, file)
 
 
-if __name__ == '__main__':
+def __write_bundle_layout(task):
+    # runs in a worker process of write_layout_bundle
+    layout_id, number_of_circles, circle_radius_list, seed, window_width, window_height, output_directory = task
+    x_positions, y_positions = generate_layout(number_of_circles, circle_radius_list, window_width, window_height,
+                                               seed)
+    coordinates = [[x, y] for x, y in zip(x_positions.tolist(), y_positions.tolist())]
+    file_name = f"layout_{layout_id:05d}.json"
+    with open(os.path.join(output_directory, file_name), "w") as file:
+        json.dump({"numberOfCircles": number_of_circles, "circleRadiusList": circle_radius_list,
+                   "coordinates": coordinates}, file)
+    return {"file": file_name, "numberOfCircles": number_of_circles, "circleRadiusList": circle_radius_list,
+            "seed": seed}
+
+
+def write_layout_bundle(circle_counts, circle_radius_lists, seeds, output_directory, window_width=WINDOW_WIDTH,
+                        window_height=WINDOW_HEIGHT, max_workers=None):
+    """
+    Generates one setup file for every combination of circle count, radius list and seed in a process pool and
+    writes them into output_directory together with a manifest.json that lists all layouts in order. The pointing
+    experiment can be started with the directory instead of a single setup file; it then only opens the manifest and
+    the layout of the current participant.
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    tasks = [(layout_id, number_of_circles, circle_radius_list, seed, window_width, window_height, output_directory)
+             for layout_id, (number_of_circles, circle_radius_list, seed) in
+             enumerate(itertools.product(circle_counts, circle_radius_lists, seeds))]
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        layouts = list(executor.map(__write_bundle_layout, tasks, chunksize=max(len(tasks) // 64, 1)))
+
+    manifest = {"windowWidth": window_width, "windowHeight": window_height, "layouts": layouts}
+    with open(os.path.join(output_directory, MANIFEST_FILE_NAME), "w") as file:
+        json.dump(manifest, file, indent=1)
+    return manifest
+
+
+def is_layout_bundle(setup_path):
+    # decided by the path alone, so a single setup file never has to be read for this
+    return os.path.isdir(setup_path) or os.path.basename(setup_path) == MANIFEST_FILE_NAME
+
+
+def get_manifest_file(bundle_path):
+    # bundle_path is the bundle directory or its manifest
+    return os.path.join(bundle_path, MANIFEST_FILE_NAME) if os.path.isdir(bundle_path) else bundle_path
+
+
+__manifest_cache = {}  # manifest file -> (modification time, layout file names)
+
+
+def __get_bundle_layout_files(manifest_file):
+    # the manifest is only parsed again if it was rewritten
+    manifest_mtime = os.stat(manifest_file).st_mtime_ns
+    cached_manifest = __manifest_cache.get(manifest_file)
+    if cached_manifest is None or cached_manifest[0] != manifest_mtime:
+        with open(manifest_file) as json_file:
+            layouts = json.load(json_file)["layouts"]
+        cached_manifest = (manifest_mtime, [layout["file"] for layout in layouts])
+        __manifest_cache[manifest_file] = cached_manifest
+    return cached_manifest[1]
+
+
+def get_setup_file_for_participant(setup_path, participant_id):
+    # setup_path is either a single setup file or a bundle directory (or its manifest) from write_layout_bundle;
+    # participants get the layouts of a bundle in order and start over when all layouts have been used
+    if not is_layout_bundle(setup_path):
+        return setup_path
+    manifest_file = get_manifest_file(setup_path)
+    layout_files = __get_bundle_layout_files(manifest_file)
+    return os.path.join(os.path.dirname(manifest_file), layout_files[(participant_id - 1) % len(layout_files)])
+
+
+def load_setup_for_participant(setup_path, participant_id):
+    with open(get_setup_file_for_participant(setup_path, participant_id)) as json_file:
+        return json.load(json_file)
+
+
+def __parse_int_list(argument):
+    # "[14,30]" or "14"; seeds can also be given as a range like "1-100"
+    if "-" in argument.strip("[]"):
+        first, last = argument.strip("[]").split("-")
+        return list(range(int(first), int(last) + 1))
+    return list(map(int, argument.strip("[]").split(",")))
+
+
+if __name__ == '__main__' and len(sys.argv) > 1 and sys.argv[1] == "batch":
+    # python3 setup_condition.py batch <circle_counts> <radius_lists> <seeds> <output_directory> [width] [height]
+    # e.g. python3 setup_condition.py batch [14,30] "[20,40];[10,30]" 1-100 layouts
+    __write_layout_bundle_args = {
+        "circle_counts": __parse_int_list(sys.argv[2]),
+        "circle_radius_lists": [__parse_int_list(radius_list) for radius_list in sys.argv[3].split(";")],
+        "seeds": __parse_int_list(sys.argv[4]),
+        "output_directory": sys.argv[5],
+        "window_width": int(sys.argv[6]) if len(sys.argv) > 6 else WINDOW_WIDTH,
+        "window_height": int(sys.argv[7]) if len(sys.argv) > 7 else WINDOW_HEIGHT,
+    }
+    __manifest = write_layout_bundle(**__write_layout_bundle_args)
+    print(f"Wrote {len(__manifest['layouts'])} layouts to {sys.argv[5]}")
+elif __name__ == '__main__':
     # argument1: number of circles
     __number_of_circles = int(sys.argv[1])
     # argument2: circle radius
     __circle_radius_list = list(map(int, sys.argv[2].strip('[]').split(',')))
     # argument3: filename
     __file_name = sys.argv[3]
-    __write_config_to_file(__number_of_circles, __circle_radius_list, __file_name)
+    # optional argument4: seed for reproducible layouts
+    __seed = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    # optional argument5 and argument6: window width and height
+    __window_width = int(sys.argv[5]) if len(sys.argv) > 5 else WINDOW_WIDTH
+    __window_height = int(sys.argv[6]) if len(sys.argv) > 6 else WINDOW_HEIGHT
+    __write_config_to_file(__number_of_circles, __circle_radius_list, __file_name, __window_width, __window_height,
+                           __seed)
 
 
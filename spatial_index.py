@@ -0,0 +1,334 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Spatial indexes used by the BubbleCursor to find the targets closest to the mouse position.
+
+Every index is built once from the target center coordinates and answers k-nearest queries with squared euclidean
+distances, so no square root has to be computed for the targets that are not returned. The results are ordered by
+(squared distance, target index), which is exactly the order the original linear scan of the BubbleCursor produced
+(on equal distances the target that comes first in the target list wins). Because of this all indexes are
+interchangeable and the LinearScanIndex can be used as the reference implementation for the faster ones.
+
+Targets with different radii are ranked by the distance to their edge (center distance minus radius) instead. Every
+index can be built with the radii of the targets, then it stores the largest radius of every cell (or subtree) to
+bound the edge distances of its targets and returns the edge distances themselves, ordered by (edge distance, target
+index). The EdgeDistanceIndex picks the cheaper of both variants for the BubbleCursor.
+"""
+
+from math import floor, inf, sqrt
+import numpy as np
+
+
+def _as_list(values) -> list:
+    # numpy arrays are converted to plain python numbers, which are a lot faster to work with in pure python loops
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+def _as_radius_list(radii, count: int):
+    # None if the index ranks the targets by their (squared) center distance
+    if radii is None:
+        return None
+    return _as_list(np.broadcast_to(np.asarray(radii), (count,)))
+
+
+def _insert_candidate(nearest: list, k: int, distance_sq, index: int) -> None:
+    # keep the (small) list of the k nearest candidates sorted by (squared distance (or edge distance), index)
+    candidate = (distance_sq, index)
+    if len(nearest) == k:
+        if candidate >= nearest[-1]:
+            return
+        nearest.pop()
+    position = len(nearest)
+    while position > 0 and candidate < nearest[position - 1]:
+        position -= 1
+    nearest.insert(position, candidate)
+
+
+class LinearScanIndex:
+    """
+    Reference implementation that compares the mouse position with every single target (O(n) per query).
+    """
+
+    def __init__(self, points_x: list, points_y: list, radii=None):
+        self._points = list(zip(_as_list(points_x), _as_list(points_y)))
+        self._radii = _as_radius_list(radii, len(self._points))
+
+    def __len__(self):
+        return len(self._points)
+
+    def nearest(self, pos_x: float, pos_y: float, k: int = 2) -> list:
+        # sorting all (distance, index) pairs at once is done in C, which is faster than inserting every target into
+        # the candidate list for the small layouts this index is used for
+        if self._radii is not None:
+            return sorted([(sqrt((x - pos_x) ** 2 + (y - pos_y) ** 2) - radius, index)
+                           for index, ((x, y), radius) in enumerate(zip(self._points, self._radii))])[:k]
+        return sorted([((x - pos_x) ** 2 + (y - pos_y) ** 2, index)
+                       for index, (x, y) in enumerate(self._points)])[:k]
+
+
+class GridIndex:
+    """
+    Uniform grid (spatial hashing) over the bounding box of all targets. A query searches the cells in rings of
+    growing size around the cell of the mouse position and stops as soon as no cell of the next ring can contain a
+    target that is closer than the k-th best one found so far. With radii, every cell also stores the largest radius of
+    its targets, and cells whose edge distances can't beat the k-th best one are skipped.
+    """
+
+    def __init__(self, points_x: list, points_y: list, cell_size: float = None, radii=None):
+        self._points = list(zip(_as_list(points_x), _as_list(points_y)))
+        self._radii = _as_radius_list(radii, len(self._points))
+        self._cells = {}
+        self._cell_max_radii = {}
+        self._max_radius = max(self._radii, default=0) if self._radii is not None else 0
+        if not self._points:
+            self._cell_size = 1
+            self._min_x = self._min_y = 0
+            self._columns = self._rows = 0
+            return
+
+        self._min_x, self._min_y = min(x for x, _ in self._points), min(y for _, y in self._points)
+        width = max(x for x, _ in self._points) - self._min_x
+        height = max(y for _, y in self._points) - self._min_y
+        if cell_size is None:
+            # aim for roughly two targets per cell if the targets are distributed uniformly
+            cell_size = sqrt(max(width * height, 1) * 2 / len(self._points))
+            # with radii the search has to go on for the largest radius beyond the k-th best edge distance, so smaller
+            # cells would only add more (mostly empty) rings
+            cell_size = max(cell_size, self._max_radius)
+        self._cell_size = max(cell_size, 1)
+        self._columns = int(width // self._cell_size) + 1
+        self._rows = int(height // self._cell_size) + 1
+
+        for index, (x, y) in enumerate(self._points):
+            cell = (int((x - self._min_x) // self._cell_size), int((y - self._min_y) // self._cell_size))
+            self._cells.setdefault(cell, []).append(index)
+            if self._radii is not None:
+                self._cell_max_radii[cell] = max(self._cell_max_radii.get(cell, 0), self._radii[index])
+
+    def __len__(self):
+        return len(self._points)
+
+    def _visit_cell(self, nearest: list, k: int, column: int, row: int, pos_x: float, pos_y: float) -> None:
+        cell = (column, row)
+        if self._radii is None:
+            for index in self._cells.get(cell, ()):
+                x, y = self._points[index]
+                _insert_candidate(nearest, k, (x - pos_x) ** 2 + (y - pos_y) ** 2, index)
+            return
+
+        if cell not in self._cells:
+            return
+        if len(nearest) == k:
+            # no target of the cell can be closer than the cell itself minus the largest radius in the cell
+            cell_x = self._min_x + column * self._cell_size
+            cell_y = self._min_y + row * self._cell_size
+            distance_x = max(cell_x - pos_x, 0, pos_x - cell_x - self._cell_size)
+            distance_y = max(cell_y - pos_y, 0, pos_y - cell_y - self._cell_size)
+            if sqrt(distance_x * distance_x + distance_y * distance_y) - self._cell_max_radii[cell] > nearest[-1][0]:
+                return
+        for index in self._cells[cell]:
+            x, y = self._points[index]
+            _insert_candidate(nearest, k, sqrt((x - pos_x) ** 2 + (y - pos_y) ** 2) - self._radii[index], index)
+
+    def nearest(self, pos_x: float, pos_y: float, k: int = 2) -> list:
+        nearest = []
+        if not self._points:
+            return nearest
+
+        # the cell of the mouse position may lie outside of the grid; that is fine as only existing cells are visited
+        query_column = floor((pos_x - self._min_x) / self._cell_size)
+        query_row = floor((pos_y - self._min_y) / self._cell_size)
+        # the number of rings that are needed to cover the whole grid from the query cell
+        max_ring = max(abs(query_column), abs(self._columns - 1 - query_column),
+                       abs(query_row), abs(self._rows - 1 - query_row))
+
+        for ring in range(max_ring + 1):
+            if len(nearest) == k:
+                # every target in this ring is at least (ring - 1) cells away from the mouse position
+                lower_bound = max(ring - 1, 0) * self._cell_size
+                if self._radii is None:
+                    if nearest[-1][0] < lower_bound * lower_bound:
+                        break
+                elif nearest[-1][0] < lower_bound - self._max_radius:
+                    break
+
+            row_min, row_max = max(query_row - ring, 0), min(query_row + ring, self._rows - 1)
+            column_min, column_max = max(query_column - ring, 0), min(query_column + ring, self._columns - 1)
+            if ring == 0:
+                if 0 <= query_column < self._columns and 0 <= query_row < self._rows:
+                    self._visit_cell(nearest, k, query_column, query_row, pos_x, pos_y)
+                continue
+            # the top and bottom row of the ring
+            for row in (query_row - ring, query_row + ring):
+                if 0 <= row < self._rows:
+                    for column in range(column_min, column_max + 1):
+                        self._visit_cell(nearest, k, column, row, pos_x, pos_y)
+            # the left and right column of the ring (without the corners that were already visited)
+            for column in (query_column - ring, query_column + ring):
+                if 0 <= column < self._columns:
+                    for row in range(max(row_min, query_row - ring + 1), min(row_max, query_row + ring - 1) + 1):
+                        self._visit_cell(nearest, k, column, row, pos_x, pos_y)
+        return nearest
+
+
+class KDTreeIndex:
+    """
+    Static 2-d tree with small leaf buckets. Queries descend into the half that contains the mouse position first and
+    only visit the other half if the splitting line is not farther away than the k-th best candidate. With radii, every
+    node also stores the largest radius of both halves, which is subtracted from the distance to the splitting line.
+    """
+
+    _LEAF_SIZE = 8
+
+    def __init__(self, points_x: list, points_y: list, radii=None):
+        self._points = list(zip(_as_list(points_x), _as_list(points_y)))
+        self._radii = _as_radius_list(radii, len(self._points))
+        self._root = self._build(list(range(len(self._points))), 0)
+
+    def __len__(self):
+        return len(self._points)
+
+    def _build(self, indices: list, depth: int):
+        if len(indices) <= self._LEAF_SIZE:
+            return indices  # a leaf is simply the list of its target indices
+
+        axis = depth % 2
+        indices.sort(key=lambda index: self._points[index][axis])
+        median = len(indices) // 2
+        split_value = self._points[indices[median]][axis]
+        left, right = indices[:median], indices[median:]
+        left_max_radius = max(self._radii[index] for index in left) if self._radii is not None else 0
+        right_max_radius = max(self._radii[index] for index in right) if self._radii is not None else 0
+        # node layout: (axis, split value, targets left of/on the split, targets right of/on the split, largest radius
+        # on the left, largest radius on the right)
+        return (axis, split_value, self._build(left, depth + 1), self._build(right, depth + 1), left_max_radius,
+                right_max_radius)
+
+    def nearest(self, pos_x: float, pos_y: float, k: int = 2) -> list:
+        nearest = []
+        if self._points:
+            self._search(self._root, (pos_x, pos_y), k, nearest)
+        return nearest
+
+    def _search(self, node, position: tuple, k: int, nearest: list) -> None:
+        if isinstance(node, list):
+            pos_x, pos_y = position
+            if self._radii is not None:
+                for index in node:
+                    x, y = self._points[index]
+                    _insert_candidate(nearest, k, sqrt((x - pos_x) ** 2 + (y - pos_y) ** 2) - self._radii[index], index)
+                return
+            for index in node:
+                x, y = self._points[index]
+                _insert_candidate(nearest, k, (x - pos_x) ** 2 + (y - pos_y) ** 2, index)
+            return
+
+        axis, split_value, left, right, left_max_radius, right_max_radius = node
+        difference = position[axis] - split_value
+        if difference < 0:
+            near, far, far_max_radius = left, right, right_max_radius
+        else:
+            near, far, far_max_radius = right, left, left_max_radius
+        self._search(near, position, k, nearest)
+        # a target on the other side could still be as close as the current k-th best one (ties are decided by the
+        # target index, so equal distances have to be visited as well)
+        worst_distance = nearest[-1][0] if len(nearest) == k else inf
+        if self._radii is None:
+            if difference * difference <= worst_distance:
+                self._search(far, position, k, nearest)
+        elif abs(difference) - far_max_radius <= worst_distance:
+            self._search(far, position, k, nearest)
+
+
+class VectorizedIndex:
+    """
+    Computes the distances to all targets in one vectorized NumPy call and selects the k nearest ones with
+    argpartition. This is still O(n) per query, but with a very small constant factor, so it stays fast up to around
+    10^5 targets without any preprocessing.
+    """
+
+    def __init__(self, points_x, points_y, radii=None):
+        self._points_x = np.asarray(points_x)
+        self._points_y = np.asarray(points_y)
+        self._radii = np.broadcast_to(np.asarray(radii), self._points_x.shape) if radii is not None else None
+
+    def __len__(self):
+        return len(self._points_x)
+
+    def nearest(self, pos_x: float, pos_y: float, k: int = 2) -> list:
+        target_count = len(self._points_x)
+        if target_count == 0:
+            return []
+
+        distances_sq = (self._points_x - pos_x) ** 2 + (self._points_y - pos_y) ** 2
+        if self._radii is not None:
+            distances_sq = np.sqrt(distances_sq) - self._radii  # the edge distances
+        k = min(k, target_count)
+        if k < target_count:
+            # argpartition doesn't care about the order of equal distances, so every target that is as close as the
+            # k-th nearest one is taken into account when the ties are broken by the target index below
+            partition = np.argpartition(distances_sq, k - 1)[:k]
+            candidates = np.flatnonzero(distances_sq <= distances_sq[partition].max())
+        else:
+            candidates = np.arange(target_count)
+        candidate_distances = distances_sq[candidates]
+        order = np.lexsort((candidates, candidate_distances))[:k]
+        return [(candidate_distances[i].item(), int(candidates[i])) for i in order]
+
+
+# up to this number of targets a plain linear scan is faster than any index (measured with the BubbleCursor in the
+# incremental mode: ~8 us per mouse move with 14 targets, while the k-d tree stays at ~30 us with 100000 targets,
+# where the VectorizedIndex needs more than 1 ms)
+LINEAR_SCAN_MAX_TARGETS = 32
+
+
+def get_spatial_index_class(target_count: int):
+    """ Returns the index class that answers the queries of the BubbleCursor the fastest for this number of targets. """
+    return LinearScanIndex if target_count <= LINEAR_SCAN_MAX_TARGETS else KDTreeIndex
+
+
+class EdgeDistanceIndex:
+    """
+    Finds the targets whose edges are closest to the mouse position. If all targets have the same radius, the order of
+    the edge distances is the order of the center distances, so a plain index over the centers is used (which can also
+    be an index that was already built, e.g. the one of a TargetLayout). Otherwise the index is built with the radii of
+    the targets and searched by the edge distances directly.
+
+    Unlike the other indexes, nearest() always returns the edge distances themselves (not squared, negative if the mouse
+    position is inside of a target).
+    """
+
+    def __init__(self, points_x, points_y, radii, spatial_index=None):
+        # spatial_index is either an index class or an index that was already built for all target centers; the
+        # latter can only be used directly if all targets have the same radius. Without one, the index class is picked
+        # by the number of targets.
+        points_x, points_y = np.asarray(points_x), np.asarray(points_y)
+        if spatial_index is None:
+            spatial_index = get_spatial_index_class(len(points_x))
+        radii = np.broadcast_to(np.asarray(radii), points_x.shape)
+        index_class = spatial_index if isinstance(spatial_index, type) else type(spatial_index)
+        self._count = len(points_x)
+        self._radius = None  # the radius of all targets, None if the radii differ
+
+        if self._count == 0 or radii.min() == radii.max():
+            self._radius = radii[0].item() if self._count > 0 else 0
+            self._index = index_class(points_x, points_y) if isinstance(spatial_index, type) else spatial_index
+        else:
+            self._index = index_class(points_x, points_y, radii=radii)
+
+    def __len__(self):
+        return self._count
+
+    def nearest(self, pos_x: float, pos_y: float, k: int = 2) -> list:
+        if self._radius is None:
+            return self._index.nearest(pos_x, pos_y, k)
+        return [(sqrt(distance_sq) - self._radius, index) for distance_sq, index in self._index.nearest(pos_x, pos_y, k)]
+
+
+SPATIAL_INDEXES = {
+    "vectorized": VectorizedIndex,
+    "linear": LinearScanIndex,
+    "grid": GridIndex,
+    "kdtree": KDTreeIndex,
+}
@@ -0,0 +1,166 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+from time import perf_counter_ns
+import numpy as np
+from PyQt5 import QtCore, QtGui, QtWidgets
+from PyQt5.QtCore import Qt
+from pointing_technique import TargetCollection
+
+# the style of a target label (with the radius of the condition); the canvas draws its targets from labels with the
+# same style, so both render modes look exactly the same
+TARGET_STYLE_SHEET = "border-color: rgb(66, 69, 183); background-color: rgb(53, 132, 228); border-style: solid; " \
+                     "border-radius: {radius}px;"
+
+
+class TargetCanvas(QtWidgets.QWidget):
+    """
+    Draws all targets of a condition in one widget instead of one QLabel per target. The targets are drawn once into a
+    cached transparent QPixmap (the target layer), so a paint event only has to fill the dirty part with the window
+    color, draw the overlay (e.g. the bubble of the BubbleCursor) and copy the dirty part of the target layer on top of
+    it. This is the same order as in the labels mode, where the overlay is painted by the parent of the labels.
+
+    Every target is drawn from a sprite, a pixmap of a label with TARGET_STYLE_SHEET that is tinted by a
+    QGraphicsColorizeEffect, just like the labels of the other render mode. There is one sprite per radius and color.
+    If the color of a target changes, only the targets around it are drawn into the target layer again (in the order
+    of the target list, so overlapping targets cover each other like the labels do).
+    """
+
+    def __init__(self, parent=None, idle_color=Qt.yellow):
+        super(TargetCanvas, self).__init__(parent)
+        self.setAttribute(Qt.WA_TransparentForMouseEvents)
+        self.setAttribute(Qt.WA_OpaquePaintEvent)  # every pixel of the dirty part is filled with the window color
+
+        self.__targets = None
+        self.__idle_color = QtGui.QColor(idle_color)
+        self.__target_layer = None  # cached transparent pixmap with all targets in their current color
+        self.__target_sprites = {}  # (radius, rgba) -> pixmap of a target in this color
+        self.__active_target_id = None
+        self.__active_color = None
+        self.__overlay_painter = None  # called with the QPainter before the targets are drawn
+        self.__paint_listener = None  # called with the perf_counter_ns() at the start of every paint event
+
+    def set_targets(self, targets: TargetCollection) -> None:
+        self.__targets = targets
+        self.__active_target_id = None
+        self.__target_layer = None
+        self.update()
+
+    def set_overlay_painter(self, overlay_painter) -> None:
+        self.__overlay_painter = overlay_painter
+
+    def set_paint_listener(self, paint_listener) -> None:
+        self.__paint_listener = paint_listener
+
+    def set_target_color(self, target_id: int, color) -> None:
+        color = QtGui.QColor(color)
+        if color == self.__idle_color:
+            if target_id == self.__active_target_id:
+                self.__active_target_id = None
+                self.__redraw_targets(self.get_target_rect(target_id))
+            return
+
+        if target_id == self.__active_target_id and color == self.__active_color:
+            return
+        previous_target_id = self.__active_target_id
+        self.__active_target_id = target_id
+        self.__active_color = color
+        if previous_target_id is not None and previous_target_id != target_id:
+            self.__redraw_targets(self.get_target_rect(previous_target_id))
+        self.__redraw_targets(self.get_target_rect(target_id))
+
+    def get_target_rect(self, target_id: int) -> QtCore.QRect:
+        x = self.__targets.x[target_id].item()
+        y = self.__targets.y[target_id].item()
+        radius = self.__targets.radius[target_id].item()
+        return QtCore.QRect(x - radius - 1, y - radius - 1, 2 * radius + 3, 2 * radius + 3)
+
+    def resizeEvent(self, event: QtGui.QResizeEvent):
+        self.__target_layer = None
+        super(TargetCanvas, self).resizeEvent(event)
+
+    def __get_target_sprite(self, radius: int, color: QtGui.QColor) -> QtGui.QPixmap:
+        sprite_key = (radius, color.rgba())
+        if sprite_key not in self.__target_sprites:
+            # the label is rendered through a transparent parent, as render() only applies the graphics effects of
+            # child widgets
+            sprite_parent = QtWidgets.QWidget()
+            sprite_parent.setAttribute(Qt.WA_TranslucentBackground)
+            sprite_parent.resize(radius * 2, radius * 2)
+            target_label = QtWidgets.QLabel(sprite_parent)
+            target_label.setStyleSheet(TARGET_STYLE_SHEET.format(radius=radius))
+            target_label.setFixedSize(radius * 2, radius * 2)
+            colorize_effect = QtWidgets.QGraphicsColorizeEffect()
+            colorize_effect.setColor(color)
+            target_label.setGraphicsEffect(colorize_effect)
+
+            pixel_ratio = self.devicePixelRatioF()
+            sprite = QtGui.QPixmap(sprite_parent.size() * pixel_ratio)
+            sprite.setDevicePixelRatio(pixel_ratio)
+            sprite.fill(Qt.transparent)
+            sprite_parent.render(sprite, QtCore.QPoint(), QtGui.QRegion(), QtWidgets.QWidget.DrawChildren)
+            sprite_parent.deleteLater()
+            self.__target_sprites[sprite_key] = sprite
+        return self.__target_sprites[sprite_key]
+
+    def __draw_targets(self, painter: QtGui.QPainter, target_ids) -> None:
+        # draws the targets in the given (ascending) order, i.e. later targets cover earlier ones
+        idle_sprites = {}  # radius -> sprite, saves the color lookup for all idle targets
+        for target_id, x, y, radius in zip(target_ids.tolist(), self.__targets.x[target_ids].tolist(),
+                                           self.__targets.y[target_ids].tolist(),
+                                           self.__targets.radius[target_ids].tolist()):
+            if target_id == self.__active_target_id:
+                sprite = self.__get_target_sprite(radius, self.__active_color)
+            else:
+                sprite = idle_sprites.get(radius)
+                if sprite is None:
+                    sprite = idle_sprites[radius] = self.__get_target_sprite(radius, self.__idle_color)
+            painter.drawPixmap(x - radius, y - radius, sprite)
+
+    def __create_target_layer(self) -> QtGui.QPixmap:
+        pixel_ratio = self.devicePixelRatioF()
+        target_layer = QtGui.QPixmap(self.size() * pixel_ratio)
+        target_layer.setDevicePixelRatio(pixel_ratio)
+        target_layer.fill(Qt.transparent)
+        if self.__targets is not None:
+            painter = QtGui.QPainter(target_layer)
+            self.__draw_targets(painter, np.arange(len(self.__targets.x)))
+            painter.end()
+        return target_layer
+
+    def __redraw_targets(self, rect: QtCore.QRect) -> None:
+        # draws all targets that intersect rect into the target layer again
+        if self.__target_layer is not None:
+            x, y, radius = self.__targets.x, self.__targets.y, self.__targets.radius
+            target_ids = np.flatnonzero((x + radius > rect.left()) & (x - radius <= rect.right()) &
+                                        (y + radius > rect.top()) & (y - radius <= rect.bottom()))
+            painter = QtGui.QPainter(self.__target_layer)
+            painter.setClipRect(rect)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_Clear)
+            painter.fillRect(rect, Qt.transparent)
+            painter.setCompositionMode(QtGui.QPainter.CompositionMode_SourceOver)
+            self.__draw_targets(painter, target_ids)
+            painter.end()
+        self.update(rect)
+
+    def paintEvent(self, event: QtGui.QPaintEvent):
+        start_ns = perf_counter_ns()
+        if self.__target_layer is None:
+            self.__target_layer = self.__create_target_layer()
+
+        painter = QtGui.QPainter(self)
+        dirty_rect = event.rect()
+        painter.fillRect(dirty_rect, self.palette().color(QtGui.QPalette.Window))
+        if self.__overlay_painter is not None:
+            # the overlay is drawn below the targets, like in the labels mode
+            painter.save()
+            self.__overlay_painter(painter)
+            painter.restore()
+
+        pixel_ratio = self.__target_layer.devicePixelRatio()
+        source_rect = QtCore.QRectF(dirty_rect.x() * pixel_ratio, dirty_rect.y() * pixel_ratio,
+                                    dirty_rect.width() * pixel_ratio, dirty_rect.height() * pixel_ratio)
+        painter.drawPixmap(QtCore.QRectF(dirty_rect), self.__target_layer, source_rect)
+        painter.end()
+        if self.__paint_listener is not None:
+            self.__paint_listener(start_ns)
@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+The target positions of a setup file, parsed once and shared by all conditions.
+
+Setup files can store the coordinates in three ways:
+    "coordinates": [[583, 433], [74, 233], ...]       (list of [x, y] pairs, written by setup_condition.py)
+    "coordinatesFile": "layout.npy"                   (binary (n, 2) array next to the setup file, for big layouts)
+    "coordinates": "(583,433);(74,233);..."           (the old string format, still supported)
+"""
+
+import os
+import numpy as np
+from pointing_technique import TargetCollection
+
+
+def parse_coordinate_string(coordinates: str) -> np.ndarray:
+    # the old format: "(x1,y1);(x2,y2);..."
+    numbers = coordinates.replace("(", "").replace(")", "").replace(";", ",")
+    return np.array(numbers.split(","), dtype=np.int64).reshape(-1, 2)
+
+
+class TargetLayout:
+
+    def __init__(self, x_positions, y_positions):
+        self.x = np.ascontiguousarray(x_positions, dtype=np.int32)
+        self.y = np.ascontiguousarray(y_positions, dtype=np.int32)
+        self.__targets_per_radius = {}
+        self.__spatial_indexes = {}
+
+    @classmethod
+    def from_setup(cls, setup_dict: dict, base_directory: str = "."):
+        if "coordinatesFile" in setup_dict:
+            coordinates = np.load(os.path.join(base_directory, setup_dict["coordinatesFile"]))
+        elif isinstance(setup_dict["coordinates"], str):
+            coordinates = parse_coordinate_string(setup_dict["coordinates"])
+        else:
+            coordinates = np.asarray(setup_dict["coordinates"], dtype=np.int64).reshape(-1, 2)
+        return cls(coordinates[:, 0], coordinates[:, 1])
+
+    def __len__(self):
+        return len(self.x)
+
+    def get_positions(self) -> list:
+        # the target centers as a list of (x, y) tuples
+        return list(zip(self.x.tolist(), self.y.tolist()))
+
+    def get_targets(self, radius: int) -> TargetCollection:
+        # the collections share the coordinate arrays of the layout, only the radius array is new
+        if radius not in self.__targets_per_radius:
+            self.__targets_per_radius[radius] = TargetCollection(self.x, self.y, radius)
+        return self.__targets_per_radius[radius]
+
+    def get_spatial_index(self, spatial_index):
+        # the spatial indexes only depend on the target centers, so they can be shared between all conditions
+        if spatial_index not in self.__spatial_indexes:
+            self.__spatial_indexes[spatial_index] = spatial_index(self.x, self.y)
+        return self.__spatial_indexes[spatial_index]
@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+# run with: python3 -m pytest test_acquisition_timer.py
+
+from acquisition_timer import AcquisitionTimer, EventClock
+
+TIMESTAMP_WRAP_MS = 2 ** 32  # QMouseEvent.timestamp() is an unsigned 32-bit number of milliseconds
+
+
+def test_event_time_uses_smallest_clock_difference():
+    event_clock = EventClock()
+    assert event_clock.get_event_time_ns(1_000, 5_000_000_000) == 5_000_000_000
+    # this event waited 4 ms in the queue
+    assert event_clock.get_event_time_ns(1_010, 5_014_000_000) == 5_010_000_000
+    assert event_clock.get_event_delay_ns(1_020, 5_021_000_000) == 1_000_000
+
+
+def test_event_time_after_wrapped_timestamp():
+    event_clock = EventClock()
+    last_timestamp_ms = TIMESTAMP_WRAP_MS - 5
+    assert event_clock.get_event_time_ns(last_timestamp_ms, 7_000_000_000) == 7_000_000_000
+    # 10 ms later the timestamp has wrapped around to 5
+    assert event_clock.get_event_time_ns(5, 7_010_000_000) == 7_010_000_000
+    assert event_clock.get_event_time_ns(15, 7_021_000_000) == 7_020_000_000
+
+
+def test_acquisition_durations_after_wrapped_timestamp(monkeypatch):
+    handler_times_ns = iter([1_000_000_000, 1_000_000_000, 1_500_000_000, 2_000_000_000])
+    monkeypatch.setattr("acquisition_timer.perf_counter_ns", lambda: next(handler_times_ns))
+    acquisition_timer = AcquisitionTimer()
+    acquisition_timer.start()
+    assert acquisition_timer.mark(TIMESTAMP_WRAP_MS - 600) == 0
+    assert acquisition_timer.mark(TIMESTAMP_WRAP_MS - 100) == 500_000_000
+    # after the wrap the durations are still measured instead of being clamped to 0
+    assert acquisition_timer.mark(400) == 500_000_000
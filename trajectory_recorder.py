@@ -0,0 +1,120 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Records the cursor trajectory (every mouse move event) with high resolution timestamps.
+
+The events are written into preallocated NumPy arrays that are used as a ring buffer, so recording an event doesn't
+allocate any new containers. When a condition is finished, the recorded events are copied out in chronological order
+and written to a binary .npy file on a background thread.
+
+Run this file directly to measure the recording overhead per event:
+    python3 trajectory_recorder.py [number_of_events]
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter_ns
+import numpy as np
+
+TRAJECTORY_DTYPE = np.dtype([
+    ("timestampNs", np.int64),  # time.perf_counter_ns() when the event was handled
+    ("x", np.int32),
+    ("y", np.int32),
+])
+
+
+class TrajectoryRecorder:
+
+    def __init__(self, output_directory: str, capacity: int = 2 ** 20):
+        # ~16 MB for the default capacity, which is enough for about 17 minutes of mouse movement at 1000 Hz; if the
+        # buffer is full, the oldest events are overwritten
+        self.__output_directory = output_directory
+        self.__capacity = capacity
+        self.__timestamps = np.zeros(capacity, dtype=np.int64)
+        self.__x_positions = np.zeros(capacity, dtype=np.int32)
+        self.__y_positions = np.zeros(capacity, dtype=np.int32)
+        self.__next_index = 0
+        self.__event_count = 0
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trajectory-writer")
+
+    @property
+    def eventCount(self):
+        return self.__event_count
+
+    @property
+    def droppedEventCount(self):
+        return max(self.__event_count - self.__capacity, 0)
+
+    def record(self, x: int, y: int) -> None:
+        # this is called for every mouse move event, so keep it as short as possible
+        index = self.__next_index
+        self.__timestamps[index] = perf_counter_ns()
+        self.__x_positions[index] = x
+        self.__y_positions[index] = y
+        index += 1
+        self.__next_index = 0 if index == self.__capacity else index
+        self.__event_count += 1
+
+    def clear(self) -> None:
+        self.__next_index = 0
+        self.__event_count = 0
+
+    def get_events(self) -> np.ndarray:
+        # copies the recorded events in chronological order
+        event_count = min(self.__event_count, self.__capacity)
+        events = np.empty(event_count, dtype=TRAJECTORY_DTYPE)
+        order = slice(0, event_count)
+        if self.__event_count > self.__capacity:
+            # the buffer has wrapped around; the oldest event is the one that would be overwritten next
+            order = np.roll(np.arange(self.__capacity), -self.__next_index)
+        events["timestampNs"] = self.__timestamps[order]
+        events["x"] = self.__x_positions[order]
+        events["y"] = self.__y_positions[order]
+        return events
+
+    def flush(self, participant_id: int, condition: int) -> str:
+        # writes all events recorded since the last flush to one file per participant and condition and returns its
+        # name; the file is written in the background
+        if self.droppedEventCount > 0:
+            print(f"Warning: the trajectory buffer was full, the first {self.droppedEventCount} events of "
+                  f"condition {condition} were not recorded")
+        events = self.get_events()
+        self.clear()
+        file_name = os.path.join(self.__output_directory, f"participant_{participant_id}_condition_{condition}.npy")
+        self.__executor.submit(self.__write_events, file_name, events)
+        return file_name
+
+    def __write_events(self, file_name: str, events: np.ndarray) -> None:
+        os.makedirs(self.__output_directory, exist_ok=True)
+        np.save(file_name, events)
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=True)
+
+
+def load_trajectory(file_name: str) -> np.ndarray:
+    return np.load(file_name)
+
+
+def measure_record_overhead(event_count: int = 10 ** 6) -> float:
+    # returns the average time in nanoseconds that record() adds to a mouse move event
+    recorder = TrajectoryRecorder(output_directory=".", capacity=2 ** 16)
+    start = perf_counter_ns()
+    for i in range(event_count):
+        recorder.record(i & 1023, i & 511)
+    duration = perf_counter_ns() - start
+
+    # subtract the cost of the loop itself
+    start = perf_counter_ns()
+    for i in range(event_count):
+        i & 1023, i & 511
+    loop_duration = perf_counter_ns() - start
+    recorder.close()
+    return (duration - loop_duration) / event_count
+
+
+if __name__ == '__main__':
+    number_of_events = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    print(f"Recording overhead: {measure_record_overhead(number_of_events):.0f} ns per event")
@@ -0,0 +1,137 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Typed binary storage for the per-target trial data (one row per target acquisition).
+
+In the CSV log the click positions and times of all targets of a condition are stored as python lists inside a single
+cell, which have to be parsed again for every analysis. The trial table stores one fixed-size record per target
+acquisition instead, so the whole file can be loaded with a single np.fromfile call and split into one NumPy array
+per column.
+
+File layout: a 16 byte header (magic bytes, format version, record size) followed by the records of TRIAL_DTYPE.
+
+Usage to convert an existing CSV log:
+    python3 trial_table.py pointingExperimentLog.csv pointingExperimentTrials.bin [setup_file]
+(the setup file is needed to restore the target radius of each condition, otherwise it is stored as 0)
+"""
+
+import ast
+import csv
+import json
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from setup_condition import get_balanced_condition_list
+
+TRIAL_DTYPE = np.dtype([
+    ("participantID", np.int32),
+    ("condition", np.int16),
+    ("bubblePointingTechnique", np.bool_),
+    ("targetIndex", np.int32),
+    ("targetRadius", np.int32),  # 0 if unknown
+    ("clickX", np.int32),
+    ("clickY", np.int32),
+    ("durationNs", np.int64),
+])
+
+_MAGIC = b"PTTRIALS"
+_FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sII")
+
+
+def create_trial_records(participant_id, condition, bubble_pointing_active, target_radius, pointer_position_list,
+                         durations_ns) -> np.ndarray:
+    records = np.zeros(len(pointer_position_list), dtype=TRIAL_DTYPE)
+    records["participantID"] = participant_id
+    records["condition"] = condition
+    records["bubblePointingTechnique"] = bubble_pointing_active
+    records["targetIndex"] = np.arange(len(pointer_position_list))
+    records["targetRadius"] = target_radius
+    if len(pointer_position_list) > 0:
+        positions = np.asarray(pointer_position_list, dtype=np.int32)
+        records["clickX"] = positions[:, 0]
+        records["clickY"] = positions[:, 1]
+    records["durationNs"] = durations_ns
+    return records
+
+
+def append_trial_records(file_name: str, records: np.ndarray) -> None:
+    with open(file_name, "ab") as trial_file:
+        if trial_file.tell() == 0:
+            trial_file.write(_HEADER.pack(_MAGIC, _FORMAT_VERSION, TRIAL_DTYPE.itemsize))
+        trial_file.write(records.astype(TRIAL_DTYPE, copy=False).tobytes())
+
+
+def load_trial_table(file_name: str) -> dict:
+    # returns one contiguous array per column
+    with open(file_name, "rb") as trial_file:
+        magic, version, record_size = _HEADER.unpack(trial_file.read(_HEADER.size))
+        if magic != _MAGIC or version != _FORMAT_VERSION or record_size != TRIAL_DTYPE.itemsize:
+            raise ValueError(f"{file_name} is not a trial table of version {_FORMAT_VERSION}")
+        records = np.fromfile(trial_file, dtype=TRIAL_DTYPE)
+    return {column: np.ascontiguousarray(records[column]) for column in TRIAL_DTYPE.names}
+
+
+def load_trial_dataframe(file_name: str):
+    import pandas as pd  # only needed for the analysis, not for the experiment itself
+    return pd.DataFrame(load_trial_table(file_name))
+
+
+class TrialTableWriter:
+    """
+    Appends the trial records of a finished condition to the trial table on a background thread.
+    """
+
+    def __init__(self, file_name: str):
+        self.__file_name = file_name
+        # a single worker keeps the records in the order they were added
+        self.__executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trial-table-writer")
+
+    def add_condition(self, participant_id, condition, bubble_pointing_active, target_radius, pointer_position_list,
+                      durations_ns) -> None:
+        records = create_trial_records(participant_id, condition, bubble_pointing_active, target_radius,
+                                       pointer_position_list, durations_ns)
+        self.__executor.submit(append_trial_records, self.__file_name, records)
+
+    def close(self) -> None:
+        self.__executor.shutdown(wait=True)
+
+
+def convert_csv_log(csv_file_name: str, trial_file_name: str, setup_file_name: str = None) -> int:
+    # converts the per-target lists of an existing CSV log into a new trial table and returns the number of records
+    condition_list = None
+    if setup_file_name is not None:
+        with open(setup_file_name) as setup_file:
+            condition_list = json.load(setup_file)["circleRadiusList"]
+
+    all_records = []
+    with open(csv_file_name, newline="") as csv_file:
+        for row in csv.DictReader(csv_file):
+            participant_id = int(float(row["participantID"]))
+            condition = int(float(row["condition"]))
+            target_radius = 0
+            if condition_list is not None:
+                target_radius = get_balanced_condition_list(condition_list, participant_id)[condition]
+            # literal_eval only accepts python literals, so the cells can't execute any code
+            pointer_position_list = ast.literal_eval(row["pointerPositionsPerTarget"])
+            durations_ns = np.rint(np.asarray(ast.literal_eval(row["timesPerTargetInS"]), dtype=np.float64) * 1e9)
+            all_records.append(create_trial_records(participant_id, condition,
+                                                    row["bubblePointingTechnique"] == "True", target_radius,
+                                                    pointer_position_list, durations_ns.astype(np.int64)))
+
+    if os.path.exists(trial_file_name):
+        os.remove(trial_file_name)
+    records = np.concatenate(all_records) if all_records else np.zeros(0, dtype=TRIAL_DTYPE)
+    append_trial_records(trial_file_name, records)
+    return len(records)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("Usage: python3 trial_table.py <csv_log_file> <trial_table_file> [setup_file]")
+        sys.exit(1)
+    record_count = convert_csv_log(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+    print(f"Converted {record_count} target acquisitions to {sys.argv[2]}")
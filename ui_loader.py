@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+# -*- coding: utf-8 -*-
+
+"""
+Loads pointing.ui without parsing the XML file on every start.
+
+The .ui file is compiled into a python module once (pointing_ui.py, the same code pyuic5 generates), which stores the
+hash of the .ui file it was compiled from. If pointing.ui is changed, the module is compiled again automatically on
+the next start. If the module can't be written (e.g. in a read-only directory), the .ui file is loaded with
+uic.loadUi instead.
+
+Run this file directly to compile the module:
+    python3 ui_loader.py [ui_file]
+"""
+
+import hashlib
+import importlib.util
+import io
+import os
+import sys
+from PyQt5 import uic
+from atomic_file import atomic_write
+
+UI_FILE_NAME = "pointing.ui"
+_HASH_VARIABLE = "UI_FILE_HASH"
+
+
+def get_compiled_ui_file_name(ui_file_name: str) -> str:
+    return os.path.splitext(ui_file_name)[0] + "_ui.py"
+
+
+def _get_ui_file_hash(ui_file_name: str) -> str:
+    with open(ui_file_name, "rb") as ui_file:
+        return hashlib.sha1(ui_file.read()).hexdigest()
+
+
+def compile_ui(ui_file_name: str = UI_FILE_NAME) -> str:
+    # returns the name of the compiled module
+    compiled_ui_file_name = get_compiled_ui_file_name(ui_file_name)
+    code = io.StringIO()
+    uic.compileUi(ui_file_name, code)
+    code.write(f"\n\n{_HASH_VARIABLE} = {_get_ui_file_hash(ui_file_name)!r}\n")
+
+    with atomic_write(compiled_ui_file_name, encoding="utf-8") as compiled_ui_file:
+        compiled_ui_file.write(code.getvalue())
+    return compiled_ui_file_name
+
+
+def _import_compiled_ui(ui_file_name: str):
+    # returns None if the module doesn't exist yet
+    compiled_ui_file_name = get_compiled_ui_file_name(ui_file_name)
+    if not os.path.exists(compiled_ui_file_name):
+        return None
+    module_name = os.path.splitext(os.path.basename(compiled_ui_file_name))[0]
+    spec = importlib.util.spec_from_file_location(module_name, compiled_ui_file_name)
+    ui_module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(ui_module)
+    return ui_module
+
+
+def load_ui(widget, ui_file_name: str = UI_FILE_NAME):
+    # sets up the ui on the widget and returns an object with all child widgets as attributes (like uic.loadUi)
+    ui_module = _import_compiled_ui(ui_file_name)
+    if ui_module is None or getattr(ui_module, _HASH_VARIABLE, None) != _get_ui_file_hash(ui_file_name):
+        try:
+            compile_ui(ui_file_name)
+        except OSError:
+            return uic.loadUi(ui_file_name, widget)
+        ui_module = _import_compiled_ui(ui_file_name)
+
+    ui_class = next(value for name, value in vars(ui_module).items() if name.startswith("Ui_"))
+    ui = ui_class()
+    ui.setupUi(widget)
+    return ui
+
+
+if __name__ == '__main__':
+    print(f"Compiled {compile_ui(sys.argv[1] if len(sys.argv) > 1 else UI_FILE_NAME)}")